@@ -1,5 +1,6 @@
 import uvicorn
 from db.db_connector import db
+from db.roadmap_cache import roadmap_cache
 from utils.logger import logger
 
 from fastapi import FastAPI, Depends
@@ -15,6 +16,7 @@ from routers.feedback import router as FeedbackRouter
 from routers.mail import router as MailRouter
 
 from services.course_scrapper import Scraper
+from services.ml_client import ml_client
 
 import dotenv
 import os
@@ -38,8 +40,12 @@ async def periodic_scrape():
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await db.connect()
+    await roadmap_cache.listen()
+    await ml_client.connect()
     asyncio.create_task(periodic_scrape())
     yield
+    await ml_client.close()
+    await roadmap_cache.close()
     await db.close()
 
 
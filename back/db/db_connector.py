@@ -80,6 +80,31 @@ class DataBase:
         finally:
             await self._pool.release(conn)
 
+    async def listen(self, channel: str, callback) -> asyncpg.Connection:
+        """Open a dedicated connection subscribed to a NOTIFY channel
+
+        The connection lives outside the pool, so a listener does not
+        take a connection away from queries.
+        """
+        conn = await asyncpg.connect(
+            user=self._db_config["user"],
+            password=self._db_config["password"],
+            database=self._db_config["database"],
+            host=self._db_config["host"],
+            port=self._db_config["port"],
+            timeout=self._db_config["timeout"],
+        )
+        await conn.add_listener(channel, callback)
+        return conn
+
+    async def unlisten(self, conn: asyncpg.Connection, channel: str,
+                       callback) -> None:
+        """Unsubscribe and close a listening connection"""
+        try:
+            await conn.remove_listener(channel, callback)
+        finally:
+            await conn.close()
+
     async def fetch(self, query: str, *args) -> list[asyncpg.Record]:
         """Execute a SELECT query and return results"""
         async with self.connection() as conn:
@@ -2,17 +2,28 @@ from db.db_connector import db
 
 from models.feedback import FeedbackCreate, FeedbackResponse
 
+CREATE_FEEDBACK_QUERY = """
+    INSERT INTO roadmap_feedback(
+        "user_id",
+        "node_id",
+        "reason"
+    ) VALUES ($1, $2, $3)
+    RETURNING *
+"""
+
+# Feedback of a user keyed by the resource of the node, ML ranks resources
+FEEDBACK_BY_USER_QUERY = """
+    SELECT n.resource_id, f.reason
+    FROM roadmap_feedback f
+    JOIN roadmap_node n ON n.node_id = f.node_id
+    WHERE f.user_id = $1
+"""
+
 
 async def create_feedback(feedback: FeedbackCreate) -> FeedbackResponse:
     try:
-        feedback_row = await db.fetchrow("""
-            INSERT INTO roadmap_feedback(
-                "user_id",
-                "node_id",
-                "reason"
-            ) VALUES ($1, $2, $3)
-            RETURNING *
-            """,
+        feedback_row = await db.fetchrow(
+            CREATE_FEEDBACK_QUERY,
             feedback.user_id,
             feedback.node_id,
             feedback.reason
@@ -6,6 +6,81 @@ from fastapi import HTTPException
 from models.resource import ResourceCreate, ResourceResponse, ResourceUpdate
 
 
+RESOURCE_BY_ID_QUERY = """
+    SELECT
+        resource_id,
+        resource_type,
+        title,
+        summary,
+        content,
+        level,
+        price,
+        language,
+        duration_hours,
+        platform,
+        rating,
+        published_date,
+        certificate_available,
+        skills_covered
+    FROM resource
+    WHERE resource_id = $1
+"""
+
+NODE_BY_RESOURCE_QUERY = """
+    SELECT
+        progress,
+        node_id
+    FROM roadmap_node
+    WHERE resource_id = $1 AND roadmap_id = $2
+"""
+
+INSERT_HISTORY_QUERY = """
+    INSERT INTO roadmap_history (
+        roadmap_id,
+        node_id,
+        title,
+        progress,
+        last_opened
+    ) VALUES ($1, $2, $3, $4, CURRENT_TIMESTAMP)
+"""
+
+CREATE_RESOURCE_QUERY = """
+    INSERT INTO resource (
+        resource_type,
+        title,
+        summary,
+        content,
+        level,
+        price,
+        language,
+        duration_hours,
+        platform,
+        rating,
+        published_date,
+        certificate_available,
+        skills_covered
+    )
+    VALUES ($1, $2, $3, $4, $5, $6,
+           $7, $8, $9, $10, $11, $12,
+           $13)
+    RETURNING *
+"""
+
+# {updates} are "field = $n" assignments, {key} the parameter number of
+# the resource_id
+UPDATE_RESOURCE_QUERY = """
+    UPDATE resource
+    SET {updates}
+    WHERE resource_id = ${key}
+    RETURNING *
+"""
+
+DELETE_RESOURCE_QUERY = """
+    DELETE FROM resource
+    WHERE resource_id = $1
+"""
+
+
 async def retrieve_resource(res_id: UUID, roadmap:UUID) -> ResourceResponse:
     """Finds resource based on given res_id
 
@@ -19,54 +94,18 @@ async def retrieve_resource(res_id: UUID, roadmap:UUID) -> ResourceResponse:
         HTTPException: 404 if resource not found
     """
     async with db.transaction() as conn:
-        row = await conn.fetchrow(
-            """
-            SELECT
-                resource_id,
-                resource_type,
-                title,
-                summary,
-                content,
-                level,
-                price,
-                language,
-                duration_hours,
-                platform,
-                rating,
-                published_date,
-                certificate_available,
-                skills_covered
-            FROM resource
-            WHERE resource_id = $1
-        """,
-            res_id,
-        )
+        row = await conn.fetchrow(RESOURCE_BY_ID_QUERY, res_id)
 
         if not row:
             logger.error(f"Resource {res_id} not found")
             raise HTTPException(status_code=404, detail="Resource not found")
         try:
             progress = await conn.fetchrow(
-                """
-                    SELECT
-                        progress,
-                        node_id
-                    FROM roadmap_node
-                    WHERE resource_id = $1 AND roadmap_id = $2
-                """,
-                res_id,
-                roadmap
+                NODE_BY_RESOURCE_QUERY, res_id, roadmap
             )
 
             await conn.execute(
-                """
-                    INSERT INTO roadmap_history (
-                        roadmap_id,
-                        node_id,
-                        title, 
-                        progress
-                    ) VALUES ($1, $2, $3, $4)
-                """,
+                INSERT_HISTORY_QUERY,
                 roadmap,
                 progress['node_id'],
                 row['title'],
@@ -96,27 +135,7 @@ async def create_resource(res: ResourceCreate) -> ResourceResponse:
     try:
         async with db.transaction() as conn:
             row = await conn.fetchrow(
-                """
-                INSERT INTO resource (
-                    resource_type,
-                    title,
-                    summary,
-                    content,
-                    level,
-                    price,
-                    language,
-                    duration_hours,
-                    platform,
-                    rating,
-                    published_date,
-                    certificate_available,
-                    skills_covered
-                )
-                VALUES ($1, $2, $3, $4, $5, $6,
-                       $7, $8, $9, $10, $11, $12,
-                       $13)
-                RETURNING *
-            """,
+                CREATE_RESOURCE_QUERY,
                 res.resource_type,
                 res.title,
                 res.summary,
@@ -193,12 +212,9 @@ async def update_resource(res: ResourceUpdate) -> ResourceResponse:
                 )
 
             values.append(res.resource_id)
-            query = f"""
-                UPDATE resource
-                SET {', '.join(updates)}
-                WHERE resource_id = ${field_index}
-                RETURNING *
-            """
+            query = UPDATE_RESOURCE_QUERY.format(
+                updates=", ".join(updates), key=field_index
+            )
 
             row = await conn.fetchrow(query, *values)
 
@@ -226,13 +242,7 @@ async def remove_resource(res_id: UUID) -> None:
     """
     try:
         async with db.transaction() as conn:
-            result = await conn.execute(
-                """
-                DELETE FROM resource
-                WHERE resource_id = $1
-                """,
-                res_id,
-            )
+            result = await conn.execute(DELETE_RESOURCE_QUERY, res_id)
 
             if result == "DELETE 0":
                 logger.error(f"Resource {res_id} not found")
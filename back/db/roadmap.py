@@ -1,4 +1,5 @@
-from uuid import UUID
+from typing import List, Optional
+from uuid import UUID, uuid4
 
 from fastapi import HTTPException
 from utils.logger import logger
@@ -15,6 +16,187 @@ from models.roadmap import (
 )
 
 from .db_connector import db
+from .roadmap_cache import roadmap_cache
+
+
+# Resolves the roadmap and aggregates its nodes and links with json_agg,
+# so a roadmap read is one round trip. {source} selects a roadmap_id,
+# NULL when the user exists but has no roadmap. The statement text is
+# constant, asyncpg prepares it once per pooled connection.
+ROADMAP_QUERY = """
+    SELECT
+        source.roadmap_id,
+        json_build_object(
+            'roadmap_id', source.roadmap_id,
+            'nodes', COALESCE((
+                SELECT json_agg(n)
+                FROM (
+                    SELECT
+                        node_id, roadmap_id, title, summary,
+                        resource_id, progress
+                    FROM roadmap_node
+                    WHERE roadmap_id = source.roadmap_id
+                ) n
+            ), '[]'),
+            'links', COALESCE((
+                SELECT json_agg(l)
+                FROM (
+                    SELECT link_id, roadmap_id, from_node, to_node
+                    FROM roadmap_link
+                    WHERE roadmap_id = source.roadmap_id
+                ) l
+            ), '[]')
+        )::text AS roadmap
+    FROM ({source}) AS source
+"""
+
+# Node progress in percent, averaged into the roadmap progress
+NODE_PROGRESS = """
+    CASE roadmap_node.progress
+        WHEN 'Done' THEN 100
+        WHEN 'In progress' THEN 50
+        ELSE 0
+    END
+"""
+
+ROADMAP_PROGRESS_QUERY = f"""
+    SELECT AVG({NODE_PROGRESS})
+    FROM roadmap_node
+    WHERE roadmap_node.roadmap_id = $1
+"""
+
+ROADMAP_BY_ID_QUERY = ROADMAP_QUERY.format(source="""
+    SELECT roadmap_id FROM user_roadmap WHERE roadmap_id = $1
+""")
+
+ROADMAP_BY_USER_ID_QUERY = ROADMAP_QUERY.format(source="""
+    SELECT roadmap_id FROM user_roadmap WHERE user_id = $1 LIMIT 1
+""")
+
+ROADMAP_BY_LOGIN_QUERY = ROADMAP_QUERY.format(source="""
+    SELECT user_roadmap.roadmap_id
+    FROM users
+    LEFT JOIN user_roadmap ON user_roadmap.user_id = users.user_id
+    WHERE users.login = $1
+    LIMIT 1
+""")
+
+CREATE_ROADMAP_QUERY = """
+    INSERT INTO user_roadmap (user_id)
+    VALUES ($1)
+    RETURNING *
+"""
+
+DELETE_ROADMAP_QUERY = """
+    DELETE FROM user_roadmap
+    WHERE roadmap_id = $1
+"""
+
+RESOURCES_BY_IDS_QUERY = """
+    SELECT resource_id, title, summary
+    FROM resource
+    WHERE resource_id = ANY($1::uuid[])
+"""
+
+INSERT_NODE_QUERY = """
+    INSERT INTO roadmap_node
+    (node_id, roadmap_id, title, summary, resource_id, progress)
+    VALUES ($1, $2, $3, $4, $5, $6)
+"""
+
+INSERT_LINK_QUERY = """
+    INSERT INTO roadmap_link (link_id, roadmap_id, from_node, to_node)
+    VALUES ($1, $2, $3, $4)
+"""
+
+NODE_BY_ID_QUERY = """
+    SELECT *
+    FROM roadmap_node
+    WHERE node_id = $1
+"""
+
+CREATE_NODE_QUERY = """
+    INSERT INTO roadmap_node
+    (roadmap_id, title, summary, resource_id, progress)
+    VALUES ($1, $2, $3, $4, $5)
+    RETURNING *
+"""
+
+# {updates} are "field = $n" assignments, {key} the parameter number of
+# the node_id. Also returns the roadmap the node was in before, a node
+# moved to another roadmap changes both of them.
+UPDATE_NODE_QUERY = """
+    UPDATE roadmap_node
+    SET {updates}
+    FROM (
+        SELECT roadmap_id
+        FROM roadmap_node
+        WHERE node_id = ${key}
+        FOR UPDATE
+    ) old
+    WHERE roadmap_node.node_id = ${key}
+    RETURNING roadmap_node.*, old.roadmap_id AS old_roadmap_id
+"""
+
+DELETE_NODE_QUERY = """
+    DELETE FROM roadmap_node
+    WHERE node_id = $1
+    RETURNING roadmap_id
+"""
+
+LINK_BY_ID_QUERY = """
+    SELECT *
+    FROM roadmap_link
+    WHERE link_id = $1
+"""
+
+CREATE_LINK_QUERY = """
+    INSERT INTO roadmap_link (roadmap_id, from_node, to_node)
+    VALUES ($1, $2, $3)
+    RETURNING *
+"""
+
+DELETE_LINK_QUERY = """
+    DELETE FROM roadmap_link
+    WHERE link_id = $1
+    RETURNING roadmap_id
+"""
+
+
+def _parse_roadmap(generation: int, payload: str,
+                   user_id: Optional[UUID] = None) -> tuple[str, RoadmapInfo]:
+    """Build the roadmap from its JSON document and cache it"""
+    etag = roadmap_cache.etag(payload)
+    roadmap = RoadmapInfo.model_validate_json(payload)
+    roadmap_cache.put(generation, etag, roadmap, user_id)
+    return etag, roadmap
+
+
+async def retrieve_roadmap_by_user_id_with_etag(
+    user_id: UUID,
+) -> tuple[str, RoadmapInfo]:
+    """Retrieve roadmap based on user ID, from the cache if possible
+
+    Args:
+        user_id (UUID): User ID
+
+    Returns:
+        tuple[str, RoadmapInfo]: ETag and roadmap with nodes and links
+    """
+    cached = roadmap_cache.get_by_user(user_id)
+    if cached is not None:
+        return cached
+
+    logger.info(f"Retrieving roadmap of user {user_id}")
+    generation = roadmap_cache.generation
+    row = await db.fetchrow(ROADMAP_BY_USER_ID_QUERY, user_id)
+
+    if not row:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Roadmap for user {user_id} not exists"
+        )
+    return _parse_roadmap(generation, row["roadmap"], user_id)
 
 
 async def retrieve_roadmap_by_user_id(user_id: UUID) -> RoadmapInfo:
@@ -26,25 +208,35 @@ async def retrieve_roadmap_by_user_id(user_id: UUID) -> RoadmapInfo:
     Returns:
         RoadmapInfo (RoadmapInfo): Lists with nodes and links
     """
-    try:
-        logger.info(f"Retrieving roadmap of user {user_id}")
-        roadmap_row = await db.fetchrow(
-            """
-            SELECT roadmap_id, user_id
-            FROM user_roadmap
-            WHERE user_id = $1
-            """,
-            user_id,
-        )
+    _, roadmap = await retrieve_roadmap_by_user_id_with_etag(user_id)
+    return roadmap
 
-        if not roadmap_row:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Roadmap for user {user_id} not exists"
-            )
-    except HTTPException:
-        raise
-    return await retrieve_roadmap(roadmap_row['roadmap_id'])
+
+async def retrieve_roadmap_with_etag(
+    roadmap_id: UUID,
+) -> tuple[str, RoadmapInfo]:
+    """Retrieve roadmap based on its id, from the cache if possible
+
+    Args:
+        roadmap_id (UUID): Roadmap ID
+
+    Returns:
+        tuple[str, RoadmapInfo]: ETag and roadmap with nodes and links
+    """
+    cached = roadmap_cache.get(roadmap_id)
+    if cached is not None:
+        return cached
+
+    logger.info(f"Retrieving roadmap {roadmap_id}")
+    generation = roadmap_cache.generation
+    row = await db.fetchrow(ROADMAP_BY_ID_QUERY, roadmap_id)
+
+    if not row:
+        logger.error(f"Roadmap {roadmap_id} not found")
+        raise HTTPException(status_code=404, detail="Roadmap not found")
+
+    logger.info(f"Roadmap {roadmap_id} retrieved successfully")
+    return _parse_roadmap(generation, row["roadmap"])
 
 
 async def retrieve_roadmap(roadmap_id: UUID) -> RoadmapInfo:
@@ -56,80 +248,47 @@ async def retrieve_roadmap(roadmap_id: UUID) -> RoadmapInfo:
     Returns:
         RoadmapInfo (RoadmapInfo): Lists with nodes and links
     """
-    async with db.transaction() as conn:
-        roadmap_exists = await conn.fetchrow(
-            """
-            SELECT 1 FROM user_roadmap WHERE roadmap_id = $1
-            """,
-            roadmap_id,
-        )
-
-        if not roadmap_exists:
-            logger.error(f"Roadmap {roadmap_id} not found")
-            raise HTTPException(status_code=404, detail="Roadmap not found")
-
-        logger.info(f"Retrieving nodes of the roadmap {roadmap_id}")
-        node_rows = await conn.fetch(
-            """
-            SELECT node_id, roadmap_id, title, summary, resource_id, progress
-            FROM roadmap_node
-            WHERE roadmap_id = $1
-            """,
-            roadmap_id,
-        )
-        logger.info(f"Retrieved nodes of the roadmap {roadmap_id}")
-
-        logger.info(f"Retrieving links of the roadmap {roadmap_id}")
-        link_rows = await conn.fetch(
-            """
-            SELECT link_id, roadmap_id, from_node, to_node
-            FROM roadmap_link
-            WHERE roadmap_id = $1
-            """,
-            roadmap_id,
-        )
-        logger.info(f"Retrieved links of the roadmap {roadmap_id}")
-
-        logger.info(f"Retrieving roadmap {roadmap_id} retrieved successfully")
-    return RoadmapInfo(
-        roadmap_id=roadmap_id,
-        nodes=[NodeResponse(**node) for node in node_rows],
-        links=[LinkResponse(**link) for link in link_rows],
-    )
+    _, roadmap = await retrieve_roadmap_with_etag(roadmap_id)
+    return roadmap
 
 
-async def retrieve_roadmap_by_login(login: str) -> RoadmapInfo:
+async def retrieve_roadmap_by_login_with_etag(
+    login: str,
+) -> tuple[str, RoadmapInfo]:
     """Retrieve roadmap based on user login
 
+    Logins can change, so this lookup always reads the database.
+
     Args:
         login (str): User login
 
     Returns:
-        RoadmapInfo (RoadmapInfo): Lists with nodes and links
+        tuple[str, RoadmapInfo]: ETag and roadmap with nodes and links
     """
     logger.info(f"Retrieving roadmap by login {login}")
-    user_row = await db.fetchrow(
-        """
-        SELECT user_id
-        FROM users
-        WHERE login = $1
-        """,
-        login,
-    )
-    if not user_row:
+    generation = roadmap_cache.generation
+    row = await db.fetchrow(ROADMAP_BY_LOGIN_QUERY, login)
+
+    if not row:
         logger.error(f"User {login} not found")
         raise HTTPException(status_code=404, detail="User not found")
-    roadmap_row = await db.fetchrow(
-        """
-        SELECT roadmap_id
-        FROM user_roadmap
-        WHERE user_id = $1
-        """,
-        user_row["user_id"],
-    )
+    if row["roadmap_id"] is None:
+        logger.error(f"User {login} has no roadmap")
+        raise HTTPException(status_code=404, detail="Roadmap not found")
+    return _parse_roadmap(generation, row["roadmap"])
+
+
+async def retrieve_roadmap_by_login(login: str) -> RoadmapInfo:
+    """Retrieve roadmap based on user login
 
-    roadmap_id = roadmap_row["roadmap_id"]
-    return await retrieve_roadmap(roadmap_id)
+    Args:
+        login (str): User login
+
+    Returns:
+        RoadmapInfo (RoadmapInfo): Lists with nodes and links
+    """
+    _, roadmap = await retrieve_roadmap_by_login_with_etag(login)
+    return roadmap
 
 
 async def create_roadmap(roadmap: RoadmapCreate) -> RoadmapResponse:
@@ -143,23 +302,102 @@ async def create_roadmap(roadmap: RoadmapCreate) -> RoadmapResponse:
     """
     async with db.transaction() as conn:
         logger.info(f"Creating new roadmap for user {roadmap.user_id}")
-        row = await conn.fetchrow(
-            """
-            INSERT INTO user_roadmap (user_id)
-            VALUES ($1)
-            RETURNING *
-        """,
-            roadmap.user_id,
-        )
+        row = await conn.fetchrow(CREATE_ROADMAP_QUERY, roadmap.user_id)
 
         if not row:
             logger.error("Failed to create roadmap")
             raise HTTPException(status_code=500,
                                 detail="Failed to create roadmap")
 
+    await roadmap_cache.invalidate(user_id=roadmap.user_id)
     return RoadmapResponse(**row)
 
 
+async def create_roadmap_from_resources(
+    user_id: UUID,
+    resource_ids: List[UUID],
+    replace_roadmap_id: Optional[UUID] = None,
+) -> RoadmapInfo:
+    """Create a roadmap with a chain of nodes in a single transaction
+
+    Resources are fetched with one query, nodes and links are inserted
+    in bulk, so the number of round trips does not grow with the
+    roadmap size.
+
+    Args:
+        user_id (UUID): Owner of the roadmap
+        resource_ids (List[UUID]): Ordered resources, one node per item
+        replace_roadmap_id (Optional[UUID]): Roadmap to delete first
+
+    Returns:
+        RoadmapInfo (RoadmapInfo): Created roadmap with nodes and links
+    """
+    resource_ids = [UUID(str(res_id)) for res_id in resource_ids]
+
+    async with db.transaction() as conn:
+        if replace_roadmap_id is not None:
+            logger.info(f"Replacing roadmap {replace_roadmap_id}")
+            await conn.execute(DELETE_ROADMAP_QUERY, replace_roadmap_id)
+
+        logger.info(f"Creating new roadmap for user {user_id}")
+        row = await conn.fetchrow(CREATE_ROADMAP_QUERY, user_id)
+        if not row:
+            logger.error("Failed to create roadmap")
+            raise HTTPException(status_code=500,
+                                detail="Failed to create roadmap")
+        roadmap_id = row["roadmap_id"]
+
+        resource_rows = await conn.fetch(RESOURCES_BY_IDS_QUERY, resource_ids)
+        resources = {row["resource_id"]: row for row in resource_rows}
+
+        nodes = []
+        for res_id in resource_ids:
+            resource = resources.get(res_id)
+            if resource is None:
+                logger.warning(f"Resource {res_id} not found, skipping")
+                continue
+            nodes.append(NodeResponse(
+                node_id=uuid4(),
+                roadmap_id=roadmap_id,
+                title=resource["title"],
+                summary=resource["summary"] or "",
+                resource_id=res_id,
+                progress="Not started",
+            ))
+
+        links = [
+            LinkResponse(
+                link_id=uuid4(),
+                roadmap_id=roadmap_id,
+                from_node=from_node.node_id,
+                to_node=to_node.node_id,
+            )
+            for from_node, to_node in zip(nodes, nodes[1:])
+        ]
+
+        logger.info(f"Inserting {len(nodes)} nodes to roadmap {roadmap_id}")
+        await conn.executemany(
+            INSERT_NODE_QUERY,
+            [
+                (node.node_id, node.roadmap_id, node.title, node.summary,
+                 node.resource_id, node.progress)
+                for node in nodes
+            ],
+        )
+
+        logger.info(f"Inserting {len(links)} links to roadmap {roadmap_id}")
+        await conn.executemany(
+            INSERT_LINK_QUERY,
+            [
+                (link.link_id, link.roadmap_id, link.from_node, link.to_node)
+                for link in links
+            ],
+        )
+
+    await roadmap_cache.invalidate(replace_roadmap_id, user_id)
+    return RoadmapInfo(roadmap_id=roadmap_id, nodes=nodes, links=links)
+
+
 async def remove_roadmap(roadmap_id: UUID):
     """Removes roadmap from DB
 
@@ -168,18 +406,14 @@ async def remove_roadmap(roadmap_id: UUID):
 
     """
     async with db.transaction() as conn:
-        row = await conn.execute(
-            """
-            DELETE FROM user_roadmap
-            WHERE roadmap_id = $1
-            """,
-            roadmap_id,
-        )
+        row = await conn.execute(DELETE_ROADMAP_QUERY, roadmap_id)
         if row == "DELETE 0":
             logger.error(f"Roadmap {roadmap_id} not found")
             raise HTTPException(status_code=404, detail="Resource not found")
         logger.info(f"Removed roadmap {roadmap_id}")
 
+    await roadmap_cache.invalidate(roadmap_id)
+
 
 async def retrieve_node(node_id: UUID) -> NodeResponse:
     """Retrieve a node from the roadmap
@@ -191,14 +425,7 @@ async def retrieve_node(node_id: UUID) -> NodeResponse:
         NodeResponse (NodeResponse): Retrieved node
     """
     async with db.transaction() as conn:
-        row = await conn.fetchrow(
-            """
-            SELECT *
-            FROM roadmap_node
-            WHERE node_id = $1
-        """,
-            node_id,
-        )
+        row = await conn.fetchrow(NODE_BY_ID_QUERY, node_id)
         if not row:
             logger.error(f"Node {node_id} not found")
             raise HTTPException(status_code=404, detail="Node not found")
@@ -221,12 +448,7 @@ async def create_node(node: NodeCreate) -> NodeResponse:
     logger.info(f"Creating new node for the roadmap{node.roadmap_id}")
     async with db.transaction() as conn:
         row = await conn.fetchrow(
-            """
-            INSERT INTO roadmap_node
-            (roadmap_id, title, summary, resource_id, progress)
-            VALUES ($1, $2, $3, $4, $5)
-            RETURNING *
-        """,
+            CREATE_NODE_QUERY,
             node.roadmap_id,
             node.title,
             node.summary,
@@ -239,6 +461,7 @@ async def create_node(node: NodeCreate) -> NodeResponse:
             raise HTTPException(status_code=500,
                                 detail="Failed to create a row")
 
+    await roadmap_cache.invalidate(row["roadmap_id"])
     return NodeResponse(**row)
 
 
@@ -271,13 +494,9 @@ async def update_node(node: NodeUpdate) -> NodeResponse:
                 status_code=400, detail="No fields provided for update"
             )
 
-        query = f"""
-            UPDATE roadmap_node
-            SET {', '.join(updates)}
-            WHERE node_id = ${len(values)}
-            RETURNING *
-        """
-
+        query = UPDATE_NODE_QUERY.format(
+            updates=", ".join(updates), key=len(values)
+        )
         row = await conn.fetchrow(query, *values)
 
         if not row:
@@ -285,6 +504,12 @@ async def update_node(node: NodeUpdate) -> NodeResponse:
             raise HTTPException(status_code=404, detail="Node not found")
 
         logger.info(f"Updated node {node.node_id}")
+
+    row = dict(row)
+    old_roadmap_id = row.pop("old_roadmap_id")
+    await roadmap_cache.invalidate(row["roadmap_id"])
+    if old_roadmap_id != row["roadmap_id"]:
+        await roadmap_cache.invalidate(old_roadmap_id)
     return NodeResponse(**row)
 
 
@@ -296,20 +521,16 @@ async def delete_node(node_id: UUID):
 
     """
     async with db.transaction() as conn:
-        row = await conn.execute(
-            """
-            DELETE FROM roadmap_node
-            WHERE node_id = $1
-        """,
-            node_id,
-        )
+        row = await conn.fetchrow(DELETE_NODE_QUERY, node_id)
 
-        if row == "DELETE 0":
+        if row is None:
             logger.error(f"Node {node_id} not found")
             raise HTTPException(status_code=404, detail="Resource not found")
 
         logger.info(f"Deleted node {node_id}")
 
+    await roadmap_cache.invalidate(row["roadmap_id"])
+
 
 async def retrieve_link(link_id: UUID) -> LinkResponse:
     """Retrieve a link from the roadmap
@@ -321,14 +542,7 @@ async def retrieve_link(link_id: UUID) -> LinkResponse:
         LinkResponse (LinkResponse): Retrieved link
     """
     async with db.transaction() as conn:
-        row = await conn.fetchrow(
-            """
-            SELECT *
-            FROM roadmap_link
-            WHERE link_id = $1
-        """,
-            link_id,
-        )
+        row = await conn.fetchrow(LINK_BY_ID_QUERY, link_id)
 
         if not row:
             logger.error(f"Link {link_id} not found")
@@ -353,11 +567,7 @@ async def create_link(link: LinkCreate) -> LinkResponse:
 
     async with db.transaction() as conn:
         row = await conn.fetchrow(
-            """
-            INSERT INTO roadmap_link (roadmap_id, from_node, to_node)
-            VALUES ($1, $2, $3)
-            RETURNING *
-        """,
+            CREATE_LINK_QUERY,
             link.roadmap_id,
             link.from_node,
             link.to_node,
@@ -368,6 +578,7 @@ async def create_link(link: LinkCreate) -> LinkResponse:
             raise HTTPException(status_code=500,
                                 detail="Failed to create a link")
 
+    await roadmap_cache.invalidate(row["roadmap_id"])
     return LinkResponse(**row)
 
 
@@ -379,19 +590,15 @@ async def delete_link(link_id: UUID):
 
     """
     async with db.transaction() as conn:
-        result = await conn.execute(
-            """
-            DELETE FROM roadmap_link
-            WHERE link_id = $1
-        """,
-            link_id,
-        )
-        logger.info(f"Deleted link {link_id}")
+        row = await conn.fetchrow(DELETE_LINK_QUERY, link_id)
 
-        if result == "DELETE 0":
+        if row is None:
             logger.error(f"Link {link_id} not found")
             raise HTTPException(status_code=404, detail="Resource not found")
-        
+        logger.info(f"Deleted link {link_id}")
+
+    await roadmap_cache.invalidate(row["roadmap_id"])
+
 
 async def get_roadmap_progress(roadmap_id: UUID) -> int:
     """Get roadmap progress based on progress of each node
@@ -402,19 +609,5 @@ async def get_roadmap_progress(roadmap_id: UUID) -> int:
     Returns:
         int: Roadmap progress in percent (0–100)
     """
-    rows = await db.fetch(
-        "SELECT progress FROM roadmap_node WHERE roadmap_id = $1",
-        roadmap_id
-    )
-
-    if not rows:
-        return 0
-
-    progress_values = {
-        'Not started': 0,
-        'In progress': 50,
-        'Done': 100
-    }
-
-    total = sum(progress_values.get(row['progress'], 0) for row in rows)
-    return round(total / len(rows))
+    progress = await db.fetchval(ROADMAP_PROGRESS_QUERY, roadmap_id)
+    return round(progress) if progress is not None else 0
@@ -0,0 +1,166 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+from uuid import UUID
+
+import dotenv
+
+from models.roadmap import RoadmapInfo
+from utils.logger import logger
+
+from .db_connector import db
+
+dotenv.load_dotenv()
+
+CHANNEL = "roadmap_cache"
+NOTIFY_QUERY = "SELECT pg_notify($1, $2)"
+
+
+class RoadmapCache:
+    """Read-through cache of roadmaps keyed by roadmap_id and user_id.
+
+    Entries hold the parsed RoadmapInfo and a content ETag, live in a
+    bounded LRU and expire after a TTL. Roadmaps are deep-copied in and
+    out, so a caller changing its response model cannot change the
+    cached entry behind its ETag. Every write in db/roadmap.py
+    evicts the affected keys. A generation counter, bumped on each
+    eviction, keeps a read that raced with a write from caching what
+    it saw. With ROADMAP_CACHE_SHARED evictions are also broadcast
+    through Postgres NOTIFY, so several backend processes stay in sync.
+    """
+
+    def __init__(self):
+        self._max_size = int(os.getenv("ROADMAP_CACHE_SIZE", 10000))
+        self._ttl = float(os.getenv("ROADMAP_CACHE_TTL", 300))
+        self._shared = os.getenv(
+            "ROADMAP_CACHE_SHARED", "false"
+        ).lower() in ("1", "true", "yes")
+
+        # str(roadmap_id) -> (expires_at, etag, roadmap)
+        self._roadmaps: OrderedDict = OrderedDict()
+        # str(user_id) -> str(roadmap_id)
+        self._users: OrderedDict = OrderedDict()
+        self._listener = None
+        self.generation = 0
+
+    @staticmethod
+    def etag(payload: str) -> str:
+        """Strong ETag of a serialized roadmap"""
+        return '"' + hashlib.sha1(payload.encode()).hexdigest() + '"'
+
+    def get(self, roadmap_id: UUID) -> Optional[tuple[str, RoadmapInfo]]:
+        """(etag, roadmap) of a cached roadmap or None"""
+        roadmap_id = str(roadmap_id)
+        entry = self._roadmaps.get(roadmap_id)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._roadmaps[roadmap_id]
+            return None
+        self._roadmaps.move_to_end(roadmap_id)
+        return entry[1], entry[2].model_copy(deep=True)
+
+    def get_by_user(self, user_id: UUID) -> Optional[tuple[str, RoadmapInfo]]:
+        """(etag, roadmap) of the cached roadmap of a user or None"""
+        user_id = str(user_id)
+        roadmap_id = self._users.get(user_id)
+        if roadmap_id is None:
+            return None
+        cached = self.get(roadmap_id)
+        if cached is None:
+            del self._users[user_id]
+            return None
+        self._users.move_to_end(user_id)
+        return cached
+
+    def put(
+        self,
+        generation: int,
+        etag: str,
+        roadmap: RoadmapInfo,
+        user_id: Optional[UUID] = None,
+    ):
+        """Store a roadmap read from the database
+
+        Args:
+            generation (int): Value of self.generation before the read,
+                the roadmap is dropped if anything was evicted since
+            etag (str): ETag of the roadmap
+            roadmap (RoadmapInfo): Roadmap to store
+            user_id (Optional[UUID]): Owner, if the read was by user
+        """
+        if generation != self.generation:
+            return
+        roadmap_id = str(roadmap.roadmap_id)
+        expires_at = time.monotonic() + self._ttl
+        self._roadmaps[roadmap_id] = (
+            expires_at, etag, roadmap.model_copy(deep=True)
+        )
+        self._roadmaps.move_to_end(roadmap_id)
+        if user_id is not None:
+            self._users[str(user_id)] = roadmap_id
+            self._users.move_to_end(str(user_id))
+
+        while len(self._roadmaps) > self._max_size:
+            self._roadmaps.popitem(last=False)
+        while len(self._users) > self._max_size:
+            self._users.popitem(last=False)
+
+    def evict(
+        self,
+        roadmap_id: Optional[UUID] = None,
+        user_id: Optional[UUID] = None,
+    ):
+        """Drop a roadmap and/or the roadmap of a user from this process"""
+        self.generation += 1
+        if roadmap_id is not None:
+            self._roadmaps.pop(str(roadmap_id), None)
+        if user_id is not None:
+            user_roadmap_id = self._users.pop(str(user_id), None)
+            if user_roadmap_id is not None:
+                self._roadmaps.pop(user_roadmap_id, None)
+
+    def clear(self):
+        self.generation += 1
+        self._roadmaps.clear()
+        self._users.clear()
+
+    async def invalidate(
+        self,
+        roadmap_id: Optional[UUID] = None,
+        user_id: Optional[UUID] = None,
+    ):
+        """Evict after a committed write, in every process if shared
+
+        Args:
+            roadmap_id (Optional[UUID]): Changed roadmap
+            user_id (Optional[UUID]): User whose roadmap changed
+        """
+        self.evict(roadmap_id, user_id)
+        if self._shared:
+            await db.execute(
+                NOTIFY_QUERY,
+                CHANNEL,
+                f"{roadmap_id or ''},{user_id or ''}",
+            )
+
+    def _on_notify(self, connection, pid, channel, payload: str):
+        roadmap_id, user_id = payload.split(",")
+        self.evict(roadmap_id or None, user_id or None)
+
+    async def listen(self):
+        """Subscribe to evictions of other processes if shared"""
+        if self._shared and self._listener is None:
+            self._listener = await db.listen(CHANNEL, self._on_notify)
+            logger.info("Roadmap cache is listening for evictions")
+
+    async def close(self):
+        if self._listener is not None:
+            await db.unlisten(self._listener, CHANNEL, self._on_notify)
+            self._listener = None
+        self.clear()
+
+
+roadmap_cache = RoadmapCache()
@@ -1,4 +1,7 @@
-from typing import Any
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional
 
 from uuid import UUID
 
@@ -6,30 +9,199 @@ from utils.logger import logger
 
 from fastapi import HTTPException, Depends, status
 from models.user import UserCreate, UserResponse
-from models.user import UserUpdate, UserSkill, UserPassword
+from models.user import UserUpdate, UserPassword
 from models.user import UserProfileResponse
 from db.db_connector import db
-from db.roadmap import get_roadmap_progress
+from db.roadmap import NODE_PROGRESS
+from db.roadmap_cache import roadmap_cache
 from services.roadmap_genaretor import generate_roadmap, update_roadmap
 
+
+def _user_query(where: str) -> str:
+    """Query of one user with skills aggregated in the same statement
+
+    Skills come as a JSON array sorted by name (bytewise, like sorting
+    in Python). The text of each query is constant, so asyncpg
+    prepares it once per pooled connection.
+
+    Args:
+        where (str): Condition on users with the lookup value as $1
+
+    Returns:
+        str: SQL query
+    """
+    return f"""
+        SELECT
+            users.user_id,
+            users.login,
+            users.password,
+            users.creation_date,
+            users.background,
+            users.education,
+            users.goals,
+            users.goal_vacancy,
+            users.mail,
+            users.is_active,
+            users.is_verified,
+            COALESCE((
+                SELECT json_agg(
+                    json_build_object(
+                        'skill', user_skills.skill,
+                        'skill_level', user_skills.skill_level,
+                        'is_goal', user_skills.is_goal
+                    )
+                    ORDER BY user_skills.skill COLLATE "C"
+                )
+                FROM user_skills
+                WHERE user_skills.user_id = users.user_id
+            ), '[]')::text AS skills
+        FROM users
+        WHERE {where}
+    """
+
+
+USER_BY_ID_QUERY = _user_query("users.user_id = $1")
+USER_BY_LOGIN_QUERY = _user_query("users.login = $1")
+USER_BY_EMAIL_QUERY = _user_query("users.mail = $1")
+
+
+# User, roadmap, progress and one page of history in one statement.
+# Progress is averaged in SQL, history is read newest first from the
+# (roadmap_id, last_opened, history_id) index and continues after the
+# keyset ($2 last_opened, $3 history_id) of the previous page, at most
+# $4 rows.
+PROFILE_QUERY = f"""
+    SELECT
+        profile_user.*,
+        user_roadmap.roadmap_id,
+        (
+            SELECT AVG({NODE_PROGRESS})
+            FROM roadmap_node
+            WHERE roadmap_node.roadmap_id = user_roadmap.roadmap_id
+        ) AS progress,
+        (
+            SELECT COALESCE(json_agg(
+                history
+                ORDER BY history.last_opened DESC, history.history_id DESC
+            ), '[]')::text
+            FROM (
+                SELECT history_id, node_id, title, progress, last_opened
+                FROM roadmap_history
+                WHERE roadmap_history.roadmap_id = user_roadmap.roadmap_id
+                    AND (
+                        $2::timestamptz IS NULL
+                        OR (last_opened, history_id)
+                            < ($2::timestamptz, $3::bigint)
+                    )
+                ORDER BY last_opened DESC, history_id DESC
+                LIMIT $4
+            ) history
+        ) AS history
+    FROM ({USER_BY_ID_QUERY}) AS profile_user
+    LEFT JOIN LATERAL (
+        SELECT roadmap_id
+        FROM user_roadmap
+        WHERE user_roadmap.user_id = profile_user.user_id
+        LIMIT 1
+    ) user_roadmap ON TRUE
+"""
+
+CREATE_USER_QUERY = """
+    INSERT INTO users (
+        login,
+        password,
+        background,
+        education,
+        goals,
+        goal_vacancy,
+        mail
+    )
+    VALUES ($1, $2, $3, $4, $5, $6, $7)
+    RETURNING *
+"""
+
+INSERT_SKILL_QUERY = """
+    INSERT INTO user_skills (
+        user_id,
+        skill,
+        skill_level,
+        is_goal
+    )
+    VALUES ($1, $2, $3, $4)
+"""
+
+USER_EXISTS_QUERY = """
+    SELECT 1 FROM users WHERE user_id = $1
+"""
+
+DELETE_SKILLS_QUERY = """
+    DELETE FROM user_skills WHERE user_id = $1
+"""
+
+DELETE_USER_ROADMAP_QUERY = """
+    DELETE FROM
+        user_roadmap
+    WHERE
+        user_id = $1
+"""
+
+USER_FEEDBACK_QUERY = """
+    SELECT node_id, reason
+    FROM roadmap_feedback
+    WHERE user_id = $1
+"""
+
+USER_ROADMAP_ID_QUERY = """
+    SELECT roadmap_id
+    FROM user_roadmap
+    WHERE user_id = $1
+"""
+
+DELETE_USER_QUERY = """
+    DELETE FROM users
+    WHERE user_id = $1
+"""
+
+# {table} is updated for the user in ${key}, {updates} are
+# "field = $n" assignments
+UPDATE_USER_QUERY = """
+    UPDATE {table}
+    SET {updates}
+    WHERE user_id = ${key}
+    RETURNING *
+"""
+
+USER_PASSWORD_BY_LOGIN_QUERY = """
+    SELECT
+        users.user_id,
+        users.login,
+        users.password,
+        users.creation_date
+    FROM users
+    WHERE users.login = $1
+"""
+
+USER_CREATED_BY_LOGIN_QUERY = """
+    SELECT
+        users.user_id,
+        users.creation_date
+    FROM users
+    WHERE users.login = $1
+"""
+
+
+def _user_from_row(row) -> UserResponse:
+    user = dict(row)
+    user["skills"] = json.loads(user["skills"])
+    return UserResponse(**user)
+
+
 async def create_user(user: UserCreate) -> UserResponse:
     try:
         async with db.transaction() as conn:
             logger.info(f"Inserting {user.login} to users table")
             user_response = await conn.fetchrow(
-                """
-                    INSERT INTO users (
-                        login,
-                        password,
-                        background,
-                        education,
-                        goals,
-                        goal_vacancy,
-                        mail
-                    )
-                    VALUES ($1, $2, $3, $4, $5, $6, $7)
-                    RETURNING *
-                """,
+                CREATE_USER_QUERY,
                 user.login,
                 user.password,
                 user.background,
@@ -55,18 +227,7 @@ async def create_user(user: UserCreate) -> UserResponse:
             logger.info(
                 f"Inserting {user.login}'s skills to user_skills table"
             )
-            await conn.executemany(
-                """
-                INSERT INTO user_skills (
-                    user_id,
-                    skill,
-                    skill_level,
-                    is_goal
-                )
-                VALUES ($1, $2, $3, $4)
-                """,
-                records
-            )
+            await conn.executemany(INSERT_SKILL_QUERY, records)
             logger.info(f"Inserted {user.login}'s skills to user_skills table")
         logger.info(f"User {user.login} successfully created")
         return UserResponse(**user_response, skills=user.skills)
@@ -76,36 +237,7 @@ async def create_user(user: UserCreate) -> UserResponse:
 
 async def retrieve_user_by_login(login: str) -> UserResponse:
     try:
-        user_response = await db.fetchrow(
-            """
-                SELECT
-                    users.user_id,
-                    users.login,
-                    users.password,
-                    users.creation_date,
-                    users.background,
-                    users.education,
-                    users.goals,
-                    users.goal_vacancy,
-                    users.mail,
-                    users.is_active,
-                    users.is_verified
-                FROM users
-                WHERE users.login = $1
-            """,
-            login
-        )
-
-        skills_response = await db.fetch(
-            """
-                SELECT skill, skill_level, is_goal
-                FROM user_skills
-                WHERE user_id = $1
-            """,
-            user_response["user_id"]
-        )
-
-        skills = [UserSkill(**s) for s in skills_response]
+        user_response = await db.fetchrow(USER_BY_LOGIN_QUERY, login)
 
         if not user_response:
             logger.error(f"Failed to retrieve user {login}")
@@ -113,43 +245,14 @@ async def retrieve_user_by_login(login: str) -> UserResponse:
                 status_code=404, detail="Failed to retrieve user"
             )
         logger.info(f"User {login} retrieved successfully")
-        return UserResponse(**user_response, skills=skills)
+        return _user_from_row(user_response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 async def retrieve_user_by_email(mail: str) -> UserResponse:
     try:
-        user_response = await db.fetchrow(
-            """
-                SELECT
-                    users.user_id,
-                    users.login,
-                    users.password,
-                    users.creation_date,
-                    users.background,
-                    users.education,
-                    users.goals,
-                    users.goal_vacancy,
-                    users.mail,
-                    users.is_active,
-                    users.is_verified
-                FROM users
-                WHERE users.mail = $1
-            """,
-            mail
-        )
-
-        skills_response = await db.fetch(
-            """
-                SELECT skill, skill_level, is_goal
-                FROM user_skills
-                WHERE user_id = $1
-            """,
-            user_response["user_id"]
-        )
-
-        skills = [UserSkill(**s) for s in skills_response]
+        user_response = await db.fetchrow(USER_BY_EMAIL_QUERY, mail)
 
         if not user_response:
             logger.error(f"Failed to retrieve user {mail}")
@@ -157,53 +260,22 @@ async def retrieve_user_by_email(mail: str) -> UserResponse:
                 status_code=404, detail="Failed to retrieve user"
             )
         logger.info(f"User {mail} retrieved successfully")
-        return UserResponse(**user_response, skills=skills)
+        return _user_from_row(user_response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 async def retrieve_user(user_id: UUID) -> UserResponse:
     try:
-        async with db.transaction() as conn:
-            user_response = await conn.fetchrow(
-                """
-                    SELECT
-                        users.user_id,
-                        users.login,
-                        users.password,
-                        users.creation_date,
-                        users.background,
-                        users.education,
-                        users.goals,
-                        users.goal_vacancy,
-                        users.mail,
-                        users.is_active,
-                        users.is_verified
-                    FROM users
-                    WHERE users.user_id = $1
-                """,
-                user_id
-            )
+        user_response = await db.fetchrow(USER_BY_ID_QUERY, user_id)
 
-            skills_response = await conn.fetch(
-                """
-                    SELECT skill, skill_level, is_goal
-                    FROM user_skills
-                    WHERE user_id = $1
-                """,
-                user_id
+        if not user_response:
+            logger.error(f"Failed to retrieve user {user_id}")
+            raise HTTPException(
+                status_code=404, detail="Failed to retrieve user"
             )
-
-            skills = [UserSkill(**s) for s in skills_response]
-            skills.sort(key=lambda skill: skill.skill)
-
-            if not user_response:
-                logger.error(f"Failed to retrieve user {user_id}")
-                raise HTTPException(
-                    status_code=404, detail="Failed to retrieve user"
-                )
-            logger.info(f"User {user_id} retrieved successfully")
-            return UserResponse(**user_response, skills=skills)
+        logger.info(f"User {user_id} retrieved successfully")
+        return _user_from_row(user_response)
     except Exception:
         raise
 
@@ -213,12 +285,7 @@ async def update_user(user: UserUpdate) -> UserResponse:
         async with db.transaction() as conn:
             updated = False
 
-            user_exists = await conn.fetchrow(
-                """
-                    SELECT 1 FROM users WHERE user_id = $1
-                """,
-                user.user_id,
-            )
+            user_exists = await conn.fetchrow(USER_EXISTS_QUERY, user.user_id)
 
             if not user_exists:
                 logger.error(f"User {user.user_id} does not exist")
@@ -229,29 +296,14 @@ async def update_user(user: UserUpdate) -> UserResponse:
 
             if user.skills is not None:
                 logger.info(f"Updating {user.user_id} skills")
-                await conn.execute(
-                    """
-                DELETE FROM user_skills WHERE user_id = $1
-                """,
-                    user.user_id,
-                )
+                await conn.execute(DELETE_SKILLS_QUERY, user.user_id)
 
                 records = [
                     (user.user_id, skill.skill,
                      skill.skill_level, skill.is_goal)
                     for skill in user.skills
                 ]
-                await conn.executemany(
-                    """
-                    INSERT INTO user_skills (
-                        user_id,
-                        skill,
-                        skill_level,
-                        is_goal)
-                    VALUES ($1, $2, $3, $4)
-                    """,
-                    records
-                )
+                await conn.executemany(INSERT_SKILL_QUERY, records)
                 logger.info(f"Updated {user.user_id} new skills")
 
                 updated = True
@@ -290,63 +342,17 @@ async def update_user(user: UserUpdate) -> UserResponse:
                 )
 
             user_response = await conn.fetchrow(
-                """
-                    SELECT
-                        users.user_id,
-                        users.login,
-                        users.password,
-                        users.creation_date,
-                        users.background,
-                        users.education,
-                        users.goals,
-                        users.goal_vacancy,
-                        users.mail,
-                        users.is_active,
-                        users.is_verified
-                    FROM users
-                    WHERE users.user_id = $1
-                """,
-                user.user_id
+                USER_BY_ID_QUERY, user.user_id
             )
 
-            skills_response = await conn.fetch(
-                """
-                    SELECT skill, skill_level, is_goal
-                    FROM user_skills
-                    WHERE user_id = $1
-                """,
-                user.user_id
-            )
-
-            skills = [UserSkill(**s) for s in skills_response]
-            skills.sort(key=lambda skill: skill.skill)
-
-            await conn.execute(
-            """
-                DELETE FROM
-                    user_roadmap
-                WHERE
-                    user_id = $1
-            """,
-            user.user_id
-            )
+            await conn.execute(DELETE_USER_ROADMAP_QUERY, user.user_id)
 
             feedback_rows = await conn.fetch(
-                """
-                SELECT node_id, reason
-                FROM roadmap_feedback
-                WHERE user_id = $1
-                """,
-                user.user_id
+                USER_FEEDBACK_QUERY, user.user_id
             )
 
             roadmap_id = await conn.fetchval(
-                """
-                SELECT roadmap_id
-                FROM user_roadmap
-                WHERE user_id = $1
-                """,
-                user.user_id
+                USER_ROADMAP_ID_QUERY, user.user_id
             )
 
             if 'password' not in users_update_fields.keys():
@@ -363,7 +369,11 @@ async def update_user(user: UserUpdate) -> UserResponse:
                         roadmap_id
                     )
 
-            return UserResponse(**user_response, skills=skills)
+            updated_user = _user_from_row(user_response)
+
+        # The old roadmap is deleted only when the transaction commits
+        await roadmap_cache.invalidate(user_id=user.user_id)
+        return updated_user
     except Exception:
         raise
 
@@ -372,18 +382,14 @@ async def remove_user(user_id: UUID) -> None:
     try:
         async with db.transaction() as conn:
             logger.info(f"Removing user {user_id}")
-            result = await conn.execute(
-                """
-                DELETE FROM users
-                WHERE user_id = $1
-                """,
-                user_id,
-            )
+            result = await conn.execute(DELETE_USER_QUERY, user_id)
 
             if result == "DELETE 0":
                 logger.error(f"Failed to remove user {user_id}")
                 raise HTTPException(status_code=404,
                                     detail="Resource not found")
+
+        await roadmap_cache.invalidate(user_id=user_id)
     except Exception:
         raise
 
@@ -393,12 +399,13 @@ async def _update(table: str, fields: dict[str, Any], user_id: UUID,
     logger.info(f"Updating {user_id} user fields {', '.join(fields.keys())}")
     values = list(fields.values()) + [user_id]
 
-    query = f"""
-    UPDATE {table}
-    SET {', '.join([f"{field} = ${i + 1}" for i, field in enumerate(fields)])}
-    WHERE user_id = ${len(values)}
-    RETURNING *
-    """
+    query = UPDATE_USER_QUERY.format(
+        table=table,
+        updates=", ".join(
+            f"{field} = ${i + 1}" for i, field in enumerate(fields)
+        ),
+        key=len(values),
+    )
 
     res = await conn.fetchrow(query, *values)
 
@@ -421,16 +428,7 @@ async def get_user_from_db(login: str) -> UserPassword:
 
     try:
         user_response = await db.fetchrow(
-            """
-                SELECT
-                    users.user_id,
-                    users.login,
-                    users.password,
-                    users.creation_date
-                FROM users
-                WHERE users.login = $1
-            """,
-            login
+            USER_PASSWORD_BY_LOGIN_QUERY, login
         )
 
         if not user_response:
@@ -450,14 +448,7 @@ async def get_userResp_from_db(login: str) -> UserResponse:
 
     try:
         user_response = await db.fetchrow(
-            """
-                SELECT
-                    users.user_id,
-                    users.creation_date
-                FROM users
-                WHERE users.login = $1
-            """,
-            login
+            USER_CREATED_BY_LOGIN_QUERY, login
         )
 
         if not user_response:
@@ -471,69 +462,83 @@ async def get_userResp_from_db(login: str) -> UserResponse:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def retrieve_user_profile(user_id: UUID) -> UserProfileResponse:
+def _history_cursor(last_opened: str, history_id: int) -> str:
+    """Opaque URL-safe cursor of the (last_opened, history_id) keyset"""
+    keyset = f"{last_opened},{history_id}".encode()
+    return base64.urlsafe_b64encode(keyset).decode().rstrip("=")
+
+
+def _parse_history_cursor(
+    cursor: Optional[str],
+) -> tuple[Optional[datetime], Optional[int]]:
+    if cursor is None:
+        return None, None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        keyset = base64.urlsafe_b64decode(padded.encode()).decode()
+        last_opened, history_id = keyset.rsplit(",", 1)
+        return datetime.fromisoformat(last_opened), int(history_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail="Invalid history cursor"
+        ) from None
+
+
+async def retrieve_user_profile(
+    user_id: UUID,
+    history_limit: int = 20,
+    history_cursor: Optional[str] = None,
+) -> UserProfileResponse:
     """ Returns profile information based on user ID
 
     Args:
         user_id (UUID): User ID
+        history_limit (int): Maximum number of history entries
+        history_cursor (Optional[str]): history_cursor of the previous
+            page, None for the most recent entries
 
     Returns:
         UserProfileResponse: User profile information
     """
-    roadmap_row = await db.fetchrow(
-        """
-            SELECT
-                roadmap_id
-            FROM
-                user_roadmap
-            WHERE
-                user_id = $1
-        """,
-        user_id
+    before_opened, before_id = _parse_history_cursor(history_cursor)
+    row = await db.fetchrow(
+        PROFILE_QUERY,
+        user_id,
+        before_opened,
+        before_id,
+        history_limit + 1,
     )
 
-    if not roadmap_row:
+    if not row or row["roadmap_id"] is None:
         raise HTTPException(
             status_code=404,
             detail=f"User {user_id} does not have any roadmaps"
         )
 
-    progress = await get_roadmap_progress(roadmap_row['roadmap_id'])
-
-    user = await retrieve_user(user_id)
-
-    history_rows = await db.fetch(
-        """
-            SELECT
-                roadmap_id,
-                node_id,
-                last_opened,
-                title,
-                progress
-            FROM
-                roadmap_history
-            WHERE
-                roadmap_id = $1
-            ORDER BY
-                last_opened DESC;
-        """,
-        roadmap_row['roadmap_id']
-    )
-
-    history = [
-        {
-            "node_id": row['node_id'],
-            "title": row['title'],
-            "progress": row["progress"]
-        }
-        for row in history_rows
-    ]
-    
-    print(history)
+    profile = dict(row)
+    roadmap_id = profile.pop("roadmap_id")
+    progress = profile.pop("progress")
+    history = json.loads(profile.pop("history"))
+
+    next_cursor = None
+    if len(history) > history_limit:
+        history = history[:history_limit]
+        last = history[-1]
+        next_cursor = _history_cursor(
+            last["last_opened"], last["history_id"]
+        )
 
     return UserProfileResponse(
-        user=user,
-        roadmap_id=roadmap_row['roadmap_id'],
-        progress=progress,
-        history=history
+        user=_user_from_row(profile),
+        roadmap_id=roadmap_id,
+        progress=round(progress) if progress is not None else 0,
+        history=[
+            {
+                "node_id": item["node_id"],
+                "title": item["title"],
+                "progress": item["progress"]
+            }
+            for item in history
+        ],
+        history_cursor=next_cursor
     )
@@ -271,3 +271,9 @@ class UserProfileResponse(BaseModel):
             }
         ]
     )
+    history_cursor: Optional[str] = Field(
+        None,
+        description="Opaque URL-safe cursor, pass as history_cursor to get "
+                    "the next history page, null on the last page",
+        examples=["MjAyNS0wNy0wMVQxMjowMDowMCswMDowMCw0Mg"]
+    )
@@ -1,6 +1,6 @@
 from uuid import UUID
 from utils.logger import logger
-from fastapi import Response, status, HTTPException
+from fastapi import Request, Response, status, HTTPException
 
 from services.roadmap_genaretor import update_roadmap, generate_roadmap
 
@@ -13,10 +13,10 @@ from db.roadmap import (
     remove_roadmap,
     retrieve_link,
     retrieve_node,
-    retrieve_roadmap,
+    retrieve_roadmap_with_etag,
     update_node,
-    retrieve_roadmap_by_login,
-    retrieve_roadmap_by_user_id
+    retrieve_roadmap_by_login_with_etag,
+    retrieve_roadmap_by_user_id_with_etag
 )
 from fastapi.routing import APIRouter
 from models.roadmap import (
@@ -36,6 +36,22 @@ from db.user import retrieve_user_profile
 router = APIRouter()
 
 
+def _roadmap_response(request: Request, response: Response, etag: str,
+                      roadmap: RoadmapInfo):
+    """Answer 304 if the client already has this version of the roadmap"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/")
+                for tag in if_none_match.split(",")}
+        if "*" in tags or etag in tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                            headers={"ETag": etag,
+                                     "Cache-Control": "no-cache"})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return roadmap
+
+
 # Roadmap
 @router.get(
     "/roadmap/{roadmap_id}",
@@ -44,9 +60,11 @@ router = APIRouter()
     description="Get roadmap",
     status_code=status.HTTP_200_OK
 )
-async def get_roadmap(roadmap_id: UUID) -> RoadmapInfo:
+async def get_roadmap(roadmap_id: UUID, request: Request,
+                      response: Response) -> RoadmapInfo:
     logger.info(f"Getting roadmap {roadmap_id}")
-    return await retrieve_roadmap(roadmap_id)
+    etag, roadmap = await retrieve_roadmap_with_etag(roadmap_id)
+    return _roadmap_response(request, response, etag, roadmap)
 
 
 @router.get(
@@ -56,9 +74,11 @@ async def get_roadmap(roadmap_id: UUID) -> RoadmapInfo:
     description="Get roadmap by user id",
     status_code=status.HTTP_200_OK
 )
-async def get_roadmap_by_user_id(user_id: UUID) -> RoadmapInfo:
+async def get_roadmap_by_user_id(user_id: UUID, request: Request,
+                                 response: Response) -> RoadmapInfo:
     logger.info(f"Getting roadmap by user id {user_id}")
-    return await retrieve_roadmap_by_user_id(user_id)
+    etag, roadmap = await retrieve_roadmap_by_user_id_with_etag(user_id)
+    return _roadmap_response(request, response, etag, roadmap)
 
 
 @router.get(
@@ -68,9 +88,11 @@ async def get_roadmap_by_user_id(user_id: UUID) -> RoadmapInfo:
     description="Get roadmap by user login",
     status_code=status.HTTP_200_OK
 )
-async def get_roadmap_by_login(login: str) -> RoadmapInfo:
+async def get_roadmap_by_login(login: str, request: Request,
+                               response: Response) -> RoadmapInfo:
     logger.info(f"Getting roadmap by login {login}")
-    return await retrieve_roadmap_by_login(login)
+    etag, roadmap = await retrieve_roadmap_by_login_with_etag(login)
+    return _roadmap_response(request, response, etag, roadmap)
 
 
 @router.post(
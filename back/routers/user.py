@@ -1,10 +1,11 @@
+from typing import Optional
 from typing_extensions import Annotated
 from uuid import UUID
 from utils.logger import logger
 
 from db.user import create_user, remove_user, retrieve_user, update_user
 from db.user import retrieve_user_profile
-from fastapi import Response, status, Depends
+from fastapi import Response, status, Depends, Query
 from fastapi.routing import APIRouter
 from models.user import UserCreate, UserProfileResponse, UserResponse, UserBase
 from models.user import UserUpdate
@@ -30,9 +31,14 @@ async def get_user(user_id: UUID) -> UserResponse:
     tags=["User"],
     status_code=status.HTTP_200_OK
 )
-async def get_user_profile(user_id: UUID) -> UserProfileResponse:
+async def get_user_profile(
+    user_id: UUID,
+    history_limit: int = Query(20, ge=1, le=100),
+    history_cursor: Optional[str] = None,
+) -> UserProfileResponse:
     logger.info(f"Getting user profile for {user_id}")
-    return await retrieve_user_profile(user_id)
+    return await retrieve_user_profile(user_id, history_limit,
+                                       history_cursor)
 
 
 @router.post(
@@ -1,15 +1,14 @@
 from fastapi.routing import APIRouter
 from db.user import retrieve_user_by_login
 from fastapi.exceptions import HTTPException
-
-import requests
+from services.ml_client import ml_client
 
 router = APIRouter()
 
 
 @router.get("/skills_list/")
 async def get_skills_list():
-    return requests.get("http://ml:8001/user_skills/").json()
+    return await ml_client.get("/user_skills/")
 
 
 @router.get("/check_login/{login}")
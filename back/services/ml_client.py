@@ -0,0 +1,112 @@
+import asyncio
+import os
+import random
+from typing import Any, Optional
+
+import aiohttp
+import dotenv
+
+from utils.logger import logger
+
+dotenv.load_dotenv()
+
+
+class MLClient:
+    """Shared async HTTP client for the ML service.
+
+    Keeps one pooled session for the application lifetime, bounds the
+    number of in-flight requests and retries transient failures with
+    exponential backoff and jitter.
+    """
+
+    _session: Optional[aiohttp.ClientSession] = None
+
+    IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+    def __init__(self):
+        self._base_url = os.getenv("ML_URL", "http://ml:8001").rstrip("/")
+        self._timeout = float(os.getenv("ML_TIMEOUT", 60))
+        self._max_retries = int(os.getenv("ML_MAX_RETRIES", 3))
+        self._backoff = float(os.getenv("ML_RETRY_BACKOFF", 0.5))
+        self._max_connections = int(os.getenv("ML_MAX_CONNECTIONS", 20))
+        self._semaphore = asyncio.Semaphore(
+            int(os.getenv("ML_MAX_CONCURRENCY", 10))
+        )
+
+    async def connect(self):
+        """Create the pooled session if it does not exist yet"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                base_url=self._base_url,
+                connector=aiohttp.TCPConnector(
+                    limit=self._max_connections,
+                    keepalive_timeout=30,
+                ),
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+                raise_for_status=True,
+            )
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        timeout: Optional[float] = None,
+        **kwargs,
+    ) -> Any:
+        """Send a request to the ML service and return decoded JSON
+
+        Failed connections and 5xx responses are retried. Timeouts and
+        dropped connections are retried only for idempotent methods: a
+        POST may still be running on the ML service, and retrying it
+        would multiply the time the caller waits. Other errors are
+        raised to the caller.
+        """
+        retry_lost = method.upper() in self.IDEMPOTENT_METHODS
+        await self.connect()
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    async with self._session.request(
+                        method, path, **kwargs
+                    ) as response:
+                        return await response.json()
+            except aiohttp.ClientResponseError as e:
+                if e.status < 500 or attempt >= self._max_retries:
+                    raise
+                error = e
+            except aiohttp.ClientConnectorError as e:
+                if attempt >= self._max_retries:
+                    raise
+                error = e
+            except (aiohttp.ClientConnectionError,
+                    asyncio.TimeoutError) as e:
+                if not retry_lost or attempt >= self._max_retries:
+                    raise
+                error = e
+
+            delay = self._backoff * 2 ** attempt
+            delay = random.uniform(delay / 2, delay)
+            attempt += 1
+            logger.warning(
+                f"ML request {method} {path} failed ({error!r}), "
+                f"retry {attempt}/{self._max_retries} in {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
+
+    async def get(self, path: str, **kwargs) -> Any:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> Any:
+        return await self.request("POST", path, **kwargs)
+
+
+ml_client = MLClient()
@@ -3,16 +3,18 @@ from uuid import UUID
 
 from utils.logger import logger
 
-from db.roadmap import create_roadmap, create_node, create_link, remove_roadmap
+from db.roadmap import create_roadmap_from_resources
 from db.db_connector import db
+from db.feedback import FEEDBACK_BY_USER_QUERY
 
-from models.roadmap import RoadmapInfo, RoadmapCreate
-from models.roadmap import NodeResponse, NodeCreate
-from models.roadmap import LinkResponse, LinkCreate
+from models.roadmap import RoadmapInfo
 
 from models.user import UserSkill
 
-import requests
+from services.ml_client import ml_client
+
+import asyncio
+import aiohttp
 
 async def generate_roadmap(
     user_id: UUID,
@@ -27,62 +29,16 @@ async def generate_roadmap(
             "user_skills": [skill.skill for skill in user_skills if skill.is_goal],
             "user_query": user_query
         }
-        response = requests.post("http://ml:8001/generate_roadmap/", json=data)
-        response.raise_for_status()
-        roadmap_info = response.json()
+        roadmap_info = await ml_client.post("/generate_roadmap/", json=data)
 
         logger.info(f"ML response: {roadmap_info}")
         
-        roadmap = await create_roadmap(
-            RoadmapCreate(user_id=user_id)
-        )
-        
-        nodes = []
-        for course in roadmap_info["nodes"]:
-            logger.info(f"Looking up resource_id: {course['resource_id']}")
-
-            resource_details = await db.fetchrow(
-                """
-                SELECT
-                    resource_id,
-                    title,
-                    summary
-                FROM
-                    resource
-                WHERE
-                    resource_id = $1
-            """,
-                course["resource_id"],
-            )
-            node = await create_node(
-                NodeCreate(
-                    roadmap_id=roadmap.roadmap_id,
-                    title=resource_details["title"],
-                    summary=resource_details["summary"],
-                    resource_id=resource_details["resource_id"],
-                    progress="Not started"
-                )
-            )
-            nodes.append(node)
-
-        links = []
-        for i in range(len(nodes) - 1):
-            link = await create_link(
-                LinkCreate(
-                    roadmap_id=roadmap.roadmap_id,
-                    from_node=nodes[i].node_id,
-                    to_node=nodes[i + 1].node_id
-                )
-            )
-            links.append(link)
-
-        return RoadmapInfo(
-            roadmap_id=roadmap.roadmap_id,
-            nodes=nodes,
-            links=links
+        return await create_roadmap_from_resources(
+            user_id,
+            [course["resource_id"] for course in roadmap_info["nodes"]]
         )
-        
-    except requests.exceptions.RequestException as e:
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         print(f"Error calling ML service: {e}")
         return None
 
@@ -103,15 +59,8 @@ async def update_roadmap(
         #     user_id
         # )
 
-        # get feedback
-        feedback_rows = await db.fetch(
-            """
-            SELECT node_id, reason
-            FROM roadmap_feedback
-            WHERE user_id = $1
-            """,
-            user_id
-        )
+        # get feedback, keyed by the resource of the node: ML ranks resources
+        feedback_rows = await db.fetch(FEEDBACK_BY_USER_QUERY, user_id)
 
         # get user's skills
         user_skills_rows = await db.fetch(
@@ -133,7 +82,9 @@ async def update_roadmap(
         )
         user_role = user_row["role"] if user_row else None
 
-        reasons = {str(row["node_id"]): row["reason"] for row in feedback_rows}
+        reasons = {
+            str(row["resource_id"]): row["reason"] for row in feedback_rows
+        }
 
         data = {
             "user_id": str(user_id),
@@ -142,58 +93,13 @@ async def update_roadmap(
             "user_role": user_role
         }
 
-        response = requests.post("http://ml:8001/update_roadmap/", json=data)
-        response.raise_for_status()
-        roadmap_info = response.json()
+        roadmap_info = await ml_client.post("/update_roadmap/", json=data)
         
-        await remove_roadmap(roadmap_id)
-
-        roadmap = await create_roadmap(
-            RoadmapCreate(user_id=user_id)
-        )
-        
-        nodes = []
-        for course in roadmap_info["nodes"]:
-            resource_details = await db.fetchrow(
-                """
-                SELECT
-                    resource_id,
-                    title,
-                    summary
-                FROM
-                    resource
-                WHERE
-                    resource_id = $1
-            """,
-                course["resource_id"],
-            )
-            node = await create_node(
-                NodeCreate(
-                    roadmap_id=roadmap.roadmap_id,
-                    title=resource_details["title"],
-                    summary=resource_details["summary"],
-                    resource_id=resource_details["resource_id"],
-                    progress="Not started"
-                )
-            )
-            nodes.append(node)
-
-        links = []
-        for i in range(len(nodes) - 1):
-            link = await create_link(
-                LinkCreate(
-                    roadmap_id=roadmap.roadmap_id,
-                    from_node=nodes[i].node_id,
-                    to_node=nodes[i + 1].node_id
-                )
-            )
-            links.append(link)
-
-        return RoadmapInfo(
-            roadmap_id=roadmap.roadmap_id,
-            nodes=nodes,
-            links=links
+        return await create_roadmap_from_resources(
+            user_id,
+            [course["resource_id"] for course in roadmap_info["nodes"]],
+            replace_roadmap_id=roadmap_id
         )
-    except requests.exceptions.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         print(f"Error calling ML service: {e}")
         return None
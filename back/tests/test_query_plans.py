@@ -0,0 +1,266 @@
+import json
+from uuid import uuid4
+
+import pytest
+
+from db.db_connector import db
+from db.feedback import FEEDBACK_BY_USER_QUERY
+from db.resource import (
+    DELETE_RESOURCE_QUERY,
+    NODE_BY_RESOURCE_QUERY,
+    RESOURCE_BY_ID_QUERY,
+    UPDATE_RESOURCE_QUERY,
+)
+from db.roadmap import (
+    DELETE_LINK_QUERY,
+    DELETE_NODE_QUERY,
+    DELETE_ROADMAP_QUERY,
+    LINK_BY_ID_QUERY,
+    NODE_BY_ID_QUERY,
+    RESOURCES_BY_IDS_QUERY,
+    ROADMAP_BY_ID_QUERY,
+    ROADMAP_BY_LOGIN_QUERY,
+    ROADMAP_BY_USER_ID_QUERY,
+    ROADMAP_PROGRESS_QUERY,
+    UPDATE_NODE_QUERY,
+)
+from db.user import (
+    DELETE_SKILLS_QUERY,
+    DELETE_USER_QUERY,
+    DELETE_USER_ROADMAP_QUERY,
+    PROFILE_QUERY,
+    UPDATE_USER_QUERY,
+    USER_BY_EMAIL_QUERY,
+    USER_BY_ID_QUERY,
+    USER_BY_LOGIN_QUERY,
+    USER_CREATED_BY_LOGIN_QUERY,
+    USER_EXISTS_QUERY,
+    USER_FEEDBACK_QUERY,
+    USER_PASSWORD_BY_LOGIN_QUERY,
+    USER_ROADMAP_ID_QUERY,
+)
+
+# Tables that grow with the number of users, a lookup must never
+# scan them sequentially
+LARGE_TABLES = {
+    "users",
+    "user_skills",
+    "resource",
+    "user_roadmap",
+    "roadmap_node",
+    "roadmap_link",
+    "roadmap_history",
+    "roadmap_feedback",
+}
+
+SEED_USERS = 2000
+NODES_PER_ROADMAP = 10
+
+# Lookups issued by db/*.py, keyed by the sample row they need.
+# Dynamic UPDATE statements are represented by a single SET field.
+HOT_QUERIES = [
+    (ROADMAP_BY_ID_QUERY, "roadmap_id"),
+    (ROADMAP_BY_USER_ID_QUERY, "user_id"),
+    (ROADMAP_BY_LOGIN_QUERY, "login"),
+    (ROADMAP_PROGRESS_QUERY, "roadmap_id"),
+    (DELETE_ROADMAP_QUERY, "roadmap_id"),
+    (RESOURCES_BY_IDS_QUERY, "resource_ids"),
+    (NODE_BY_ID_QUERY, "node_id"),
+    (UPDATE_NODE_QUERY.format(updates="title = $1", key=2),
+     "title", "node_id"),
+    (DELETE_NODE_QUERY, "node_id"),
+    (LINK_BY_ID_QUERY, "link_id"),
+    (DELETE_LINK_QUERY, "link_id"),
+    (USER_BY_ID_QUERY, "user_id"),
+    (USER_BY_LOGIN_QUERY, "login"),
+    (USER_BY_EMAIL_QUERY, "mail"),
+    (PROFILE_QUERY, "user_id", "none", "none", "page_size"),
+    (PROFILE_QUERY, "user_id", "last_opened", "history_id", "page_size"),
+    (USER_EXISTS_QUERY, "user_id"),
+    (USER_ROADMAP_ID_QUERY, "user_id"),
+    (USER_FEEDBACK_QUERY, "user_id"),
+    (USER_PASSWORD_BY_LOGIN_QUERY, "login"),
+    (USER_CREATED_BY_LOGIN_QUERY, "login"),
+    (UPDATE_USER_QUERY.format(table="users", updates="goals = $1", key=2),
+     "title", "user_id"),
+    (DELETE_USER_ROADMAP_QUERY, "user_id"),
+    (DELETE_SKILLS_QUERY, "user_id"),
+    (DELETE_USER_QUERY, "user_id"),
+    (RESOURCE_BY_ID_QUERY, "resource_id"),
+    (NODE_BY_RESOURCE_QUERY, "resource_id", "roadmap_id"),
+    (UPDATE_RESOURCE_QUERY.format(updates="title = $1", key=2),
+     "title", "resource_id"),
+    (DELETE_RESOURCE_QUERY, "resource_id"),
+    (FEEDBACK_BY_USER_QUERY, "user_id"),
+    # Lookups Postgres runs itself for ON DELETE CASCADE
+    ("SELECT 1 FROM roadmap_link WHERE from_node = $1", "node_id"),
+    ("SELECT 1 FROM roadmap_link WHERE to_node = $1", "node_id"),
+    ("SELECT 1 FROM roadmap_history WHERE node_id = $1", "node_id"),
+    ("SELECT 1 FROM roadmap_feedback WHERE node_id = $1", "node_id"),
+]
+
+
+async def seed(conn, tag: str):
+    """Fill every large table with users, roadmaps, nodes, links,
+    history, feedback and resources, then refresh planner statistics"""
+    await conn.execute(
+        """
+        INSERT INTO users (login, mail, password)
+        SELECT 'plan' || g || $1::text,
+            'plan' || g || $1::text || '@test.io',
+            'x'
+        FROM generate_series(1, $2::int) g
+        """,
+        tag,
+        SEED_USERS,
+    )
+    await conn.execute(
+        """
+        INSERT INTO user_skills (user_id, skill, skill_level, is_goal)
+        SELECT user_id, 'skill ' || g, 'Beginner', g = 1
+        FROM users, generate_series(1, 3) g
+        WHERE login LIKE 'plan%' || $1::text
+        """,
+        tag,
+    )
+    await conn.execute(
+        """
+        INSERT INTO resource (resource_type, title, content)
+        SELECT 'Course', 'Course ' || g,
+            'https://test.io/' || $1::text || '/' || g
+        FROM generate_series(1, $2::int) g
+        """,
+        tag,
+        SEED_USERS,
+    )
+    await conn.execute(
+        """
+        INSERT INTO user_roadmap (user_id)
+        SELECT user_id FROM users WHERE login LIKE 'plan%' || $1::text
+        """,
+        tag,
+    )
+    await conn.execute(
+        """
+        INSERT INTO roadmap_node (roadmap_id, title, resource_id)
+        SELECT r.roadmap_id, 'Node ' || g, gen_random_uuid()
+        FROM user_roadmap r
+        JOIN users u ON u.user_id = r.user_id
+        CROSS JOIN generate_series(1, $2::int) g
+        WHERE u.login LIKE 'plan%' || $1::text
+        """,
+        tag,
+        NODES_PER_ROADMAP,
+    )
+    await conn.execute(
+        """
+        INSERT INTO roadmap_link (roadmap_id, from_node, to_node)
+        SELECT roadmap_id, node_id, next_node
+        FROM (
+            SELECT roadmap_id, node_id, LEAD(node_id) OVER (
+                PARTITION BY roadmap_id ORDER BY title
+            ) AS next_node
+            FROM roadmap_node
+            WHERE title LIKE 'Node %'
+        ) chain
+        WHERE next_node IS NOT NULL
+        """
+    )
+    await conn.execute(
+        """
+        INSERT INTO roadmap_history
+            (roadmap_id, node_id, title, last_opened, progress)
+        SELECT roadmap_id, node_id, title,
+            now() - random() * interval '30 days', progress
+        FROM roadmap_node
+        WHERE title LIKE 'Node %'
+        """
+    )
+    await conn.execute(
+        """
+        INSERT INTO roadmap_feedback (user_id, node_id, reason)
+        SELECT r.user_id, n.node_id, 'Too hard'
+        FROM roadmap_node n
+        JOIN user_roadmap r ON r.roadmap_id = n.roadmap_id
+        WHERE n.title = 'Node 1'
+        """
+    )
+    for table in LARGE_TABLES:
+        await conn.execute(f"ANALYZE {table}")
+
+
+async def sample(conn, tag: str) -> dict:
+    row = await conn.fetchrow(
+        """
+        SELECT u.user_id, u.login, u.mail, r.roadmap_id,
+            n.node_id, n.resource_id AS node_resource_id, l.link_id,
+            h.last_opened, h.history_id
+        FROM users u
+        JOIN user_roadmap r ON r.user_id = u.user_id
+        JOIN roadmap_node n ON n.roadmap_id = r.roadmap_id
+        JOIN roadmap_link l ON l.from_node = n.node_id
+        JOIN roadmap_history h ON h.node_id = n.node_id
+        WHERE u.login = 'plan1' || $1::text
+        LIMIT 1
+        """,
+        tag,
+    )
+    resource_ids = await conn.fetch(
+        "SELECT resource_id FROM resource WHERE content LIKE $1 LIMIT 10",
+        f"https://test.io/{tag}/%",
+    )
+    return {
+        "user_id": row["user_id"],
+        "login": row["login"],
+        "mail": row["mail"],
+        "roadmap_id": row["roadmap_id"],
+        "node_id": row["node_id"],
+        "link_id": row["link_id"],
+        "resource_id": row["node_resource_id"],
+        "resource_ids": [r["resource_id"] for r in resource_ids],
+        "last_opened": row["last_opened"],
+        "history_id": row["history_id"],
+        "title": "x",
+        "none": None,
+        "page_size": 21,
+    }
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """Large tables read by a Seq Scan anywhere in the plan tree"""
+    found = []
+    if (plan.get("Node Type") == "Seq Scan"
+            and plan.get("Relation Name") in LARGE_TABLES):
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+@pytest.mark.asyncio
+async def test_hot_queries_use_indexes(setup_db):
+    tag = uuid4().hex[:8]
+    failures = []
+
+    async with db.connection() as conn:
+        tr = conn.transaction()
+        await tr.start()
+        try:
+            await seed(conn, tag)
+            params = await sample(conn, tag)
+
+            for query, *keys in HOT_QUERIES:
+                explain = await conn.fetchval(
+                    f"EXPLAIN (FORMAT JSON) {query}",
+                    *[params[key] for key in keys],
+                )
+                if isinstance(explain, str):
+                    explain = json.loads(explain)
+                scanned = seq_scans(explain[0]["Plan"])
+                if scanned:
+                    failures.append(f"{query} -> Seq Scan on {scanned}")
+        finally:
+            # Seeded rows and their statistics are never committed
+            await tr.rollback()
+
+    assert not failures, "\n".join(failures)
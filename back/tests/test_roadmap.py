@@ -80,3 +80,77 @@ async def test_delete_roadmap_by_invalid_uuid(async_client):
 async def test_delete_not_existing_roadmap(async_client):
     response = await async_client.delete(f"/roadmap/{uuid4()}")
     assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_get_roadmap_with_nodes_and_links(async_client, created_user,
+                                                created_roadmap,
+                                                created_two_nodes,
+                                                created_link):
+    expected = RoadmapInfo(
+        roadmap_id=created_roadmap["roadmap_id"],
+        nodes=list(created_two_nodes),
+        links=[created_link],
+    )
+
+    for url in (
+        f"/roadmap/{created_roadmap['roadmap_id']}",
+        f"/roadmap_by_user_id/{created_user['user_id']}",
+        f"/roadmap_by_login/{created_user['login']}",
+    ):
+        response = await async_client.get(url)
+        assert response.status_code == 200
+        actual = RoadmapInfo(**response.json())
+        assert actual.roadmap_id == expected.roadmap_id
+        assert sorted(actual.nodes, key=lambda n: str(n.node_id)) == \
+            sorted(expected.nodes, key=lambda n: str(n.node_id))
+        assert actual.links == expected.links
+
+
+@pytest.mark.asyncio
+async def test_get_roadmap_by_user_without_roadmap(async_client,
+                                                   created_user):
+    response = await async_client.get(
+        f"/roadmap_by_user_id/{created_user['user_id']}")
+    assert response.status_code == 404
+
+    response = await async_client.get(
+        f"/roadmap_by_login/{created_user['login']}")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_get_roadmap_by_unknown_login(async_client):
+    response = await async_client.get(f"/roadmap_by_login/{uuid4()}")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_get_roadmap_not_modified(async_client, created_user,
+                                        created_roadmap, created_resource,
+                                        fake_node_data):
+    urls = (
+        f"/roadmap/{created_roadmap['roadmap_id']}",
+        f"/roadmap_by_user_id/{created_user['user_id']}",
+    )
+    etags = {}
+    for url in urls:
+        response = await async_client.get(url)
+        assert response.status_code == 200
+        etags[url] = response.headers["etag"]
+
+        response = await async_client.get(
+            url, headers={"If-None-Match": etags[url]})
+        assert response.status_code == 304
+
+    fake_node_data["roadmap_id"] = created_roadmap["roadmap_id"]
+    fake_node_data["resource_id"] = created_resource["resource_id"]
+    response = await async_client.post("/node/", json=fake_node_data)
+    assert response.status_code == 201
+
+    for url in urls:
+        response = await async_client.get(
+            url, headers={"If-None-Match": etags[url]})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etags[url]
+        assert len(response.json()["nodes"]) == 1
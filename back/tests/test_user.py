@@ -137,3 +137,65 @@ async def test_delete_user_by_invalid_uuid(async_client):
 async def test_delete_not_existing_user(async_client):
     response = await async_client.delete(f"/users/{uuid4()}")
     assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_check_login_and_email(async_client, created_user):
+    response = await async_client.get(
+        f"/check_login/{created_user['login']}")
+    assert response.status_code == 200
+    assert response.json() == {"exists": True}
+
+    response = await async_client.get(
+        f"/check_email/{created_user['mail']}")
+    assert response.status_code == 200
+    assert response.json() == {"exists": True}
+
+    response = await async_client.get(f"/check_login/{uuid4()}")
+    assert response.json() == {"exists": False}
+
+
+@pytest.mark.asyncio
+async def test_get_user_profile(async_client, created_user, created_roadmap,
+                                created_resource, created_node):
+    for _ in range(3):
+        response = await async_client.get(
+            f"/resources/{created_resource['resource_id']}",
+            params={"roadmapId": created_roadmap["roadmap_id"]})
+        assert response.status_code == 200
+
+    url = f"/users/profile/{created_user['user_id']}/"
+    response = await async_client.get(url, params={"history_limit": 2})
+    assert response.status_code == 200
+    profile = response.json()
+    assert profile["roadmap_id"] == created_roadmap["roadmap_id"]
+    assert profile["user"]["user_id"] == created_user["user_id"]
+    assert profile["progress"] == {
+        "Not started": 0, "In progress": 50, "Done": 100
+    }[created_node["progress"]]
+    assert len(profile["history"]) == 2
+    assert profile["history"][0]["node_id"] == created_node["node_id"]
+    assert profile["history_cursor"] is not None
+
+    response = await async_client.get(url, params={
+        "history_limit": 2,
+        "history_cursor": profile["history_cursor"]})
+    assert response.status_code == 200
+    page = response.json()
+    assert len(page["history"]) == 1
+    assert page["history_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_get_user_profile_without_roadmap(async_client, created_user):
+    response = await async_client.get(
+        f"/users/profile/{created_user['user_id']}/")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_get_user_profile_invalid_cursor(async_client, created_user):
+    response = await async_client.get(
+        f"/users/profile/{created_user['user_id']}/",
+        params={"history_cursor": "yesterday"})
+    assert response.status_code == 400
@@ -77,4 +77,8 @@ CREATE TABLE roadmap_feedback (
     user_id UUID REFERENCES users(user_id) ON DELETE CASCADE,
     node_id UUID REFERENCES Roadmap_Node(node_id) ON DELETE CASCADE,
     reason VARCHAR(50)
-);
\ No newline at end of file
+);
+-- Changes made after the initial schema, shared with existing databases
+\ir migrations/001_lookup_indexes.sql
+\ir migrations/002_history_last_opened.sql
+\ir migrations/003_history_id.sql
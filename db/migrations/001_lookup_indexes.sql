@@ -0,0 +1,24 @@
+-- Secondary indexes for roadmap and profile lookups.
+-- Foreign keys on roadmap_link, roadmap_history and roadmap_feedback node_id
+-- are indexed too, otherwise every node delete scans them for the cascade.
+-- History pages by roadmap are indexed in 003_history_id.sql.
+-- Safe to run more than once:
+--   psql -U "$DB_USER" -d "$DB_NAME" -f db/migrations/001_lookup_indexes.sql
+CREATE INDEX IF NOT EXISTS idx_user_roadmap_user_id
+    ON user_roadmap (user_id);
+CREATE INDEX IF NOT EXISTS idx_roadmap_node_roadmap_id
+    ON roadmap_node (roadmap_id);
+CREATE INDEX IF NOT EXISTS idx_roadmap_node_resource_roadmap
+    ON roadmap_node (resource_id, roadmap_id);
+CREATE INDEX IF NOT EXISTS idx_roadmap_link_roadmap_id
+    ON roadmap_link (roadmap_id);
+CREATE INDEX IF NOT EXISTS idx_roadmap_link_from_node
+    ON roadmap_link (from_node);
+CREATE INDEX IF NOT EXISTS idx_roadmap_link_to_node
+    ON roadmap_link (to_node);
+CREATE INDEX IF NOT EXISTS idx_roadmap_history_node_id
+    ON roadmap_history (node_id);
+CREATE INDEX IF NOT EXISTS idx_roadmap_feedback_user_id
+    ON roadmap_feedback (user_id);
+CREATE INDEX IF NOT EXISTS idx_roadmap_feedback_node_id
+    ON roadmap_feedback (node_id);
@@ -0,0 +1,8 @@
+-- roadmap_history.last_opened was never filled in, so history could not
+-- be ordered or paginated. Old rows are treated as the oldest ones.
+UPDATE roadmap_history
+SET last_opened = to_timestamp(0)
+WHERE last_opened IS NULL;
+ALTER TABLE roadmap_history
+    ALTER COLUMN last_opened SET DEFAULT CURRENT_TIMESTAMP,
+    ALTER COLUMN last_opened SET NOT NULL;
@@ -0,0 +1,8 @@
+-- Several opens of a node can share last_opened, so (last_opened, node_id)
+-- did not identify a history row and a page boundary could skip or repeat
+-- entries. history_id is the unique tiebreaker of the history keyset.
+ALTER TABLE roadmap_history
+    ADD COLUMN IF NOT EXISTS history_id BIGSERIAL PRIMARY KEY;
+CREATE INDEX IF NOT EXISTS idx_roadmap_history_roadmap_opened_id
+    ON roadmap_history (roadmap_id, last_opened DESC, history_id DESC);
+DROP INDEX IF EXISTS idx_roadmap_history_roadmap_last_opened;
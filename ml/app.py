@@ -1,10 +1,16 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 from models import ResourceSend, RoadmapData, RoadmapResponse, RoadmapUpdateData
 
-from vector_search import CourseVectorSearch
+from vector_search import CourseVectorSearch, QdrantUnavailableError
 from skipGapAnalyzer import SkillGapAnalyzer
 from ranker import CourseRanker
+from skill_index import SkillIndex
+from ranking_store import RankingStore
 
+import asyncio
+import contextlib
 import json
 import dotenv
 import os
@@ -32,36 +38,149 @@ for role, skills in job_skills_raw.items():
     PRIORITIES_BY_ROLE[role] = {item["skill"]: item["priority"] for item in skills}
     USER_SKILLS.update(ROLE_TO_SKILLS[role])
 
+with open('./reverse_skill_map.json', 'r', encoding='utf-8') as f:
+    SKILL_SYNONYMS = json.load(f)
+
 search_engine = CourseVectorSearch()
-analyzer = SkillGapAnalyzer(ROLE_TO_SKILLS)
-ranker = CourseRanker(PRIORITIES_BY_ROLE, skill_gap_analyzer=analyzer)
+search_engine.precompute_roles(ROLE_TO_SKILLS)
+
+skill_index = SkillIndex(SKILL_SYNONYMS)
+skill_index.add_roles(ROLE_TO_SKILLS)
+
+analyzer = SkillGapAnalyzer(ROLE_TO_SKILLS, skill_index=skill_index)
+ranker = CourseRanker(PRIORITIES_BY_ROLE, skill_gap_analyzer=analyzer, skill_index=skill_index)
+
+try:
+    catalog_courses = list(search_engine.catalog_courses())
+    skill_index.add_courses(course["skills"] for course in catalog_courses)
+    # author and skill inverted indexes for feedback and search exclusions
+    ranker.catalog.add_many(catalog_courses)
+except Exception as e:
+    logger.error(f"Could not warm up skill index and course catalog: {e}")
+
+# courses in a roadmap, only these are built by the ranker, the rest is lazy
+ROADMAP_LENGTH = 10
+
+# ranked course ids + scores per user, for /update_roadmap/
+ranking_store = RankingStore()
+
+
+async def load_ranking(user_id, user_role: str, user_skills: list):
+    """ranking of the last roadmap of the user; ranked again if the session is lost"""
+    session = await asyncio.to_thread(ranking_store.get, user_id)
+    stored = session["context"] if session else {}
+    context = {
+        "role": user_role or stored.get("role"),
+        "skills": user_skills if user_skills is not None else stored.get("skills", []),
+        "query": stored.get("query", ""),
+        "excluded": kept_exclusions(stored, user_role or stored.get("role"))
+    }
+    user_role, user_skills = context["role"], context["skills"]
+    missing_skills = analyzer.compute_gap(user_skills, user_role)['missing_skills']
+
+    if session is None:
+        logger.warning(f"No ranking session for user {user_id}, ranking again")
+        best_courses = await search_engine.get_courses_async(user_role, context["query"], user_skills,
+                                                             exclude_ids(context["excluded"]))
+        return ranker.rank_with_fallback(best_courses, missing_skills, user_skills, user_role), context
+
+    courses = await asyncio.to_thread(search_engine.fetch_courses, session["ids"])
+    scores = dict(zip(session["ids"], session["scores"]))
+    ranked = ranker.restore_ranking(
+        courses, [scores[course["details"]["id"]] for course in courses], missing_skills, user_role
+    )
+    return ranked, context
+
+
+def kept_exclusions(context: dict, user_role: str) -> dict:
+    """exclusions from earlier feedback, they are dropped when the user changes role"""
+    if context.get("role") != user_role:
+        return {}
+    return context.get("excluded", {})
+
+
+def exclude_ids(excluded: dict):
+    """course ids the user threw out (directly, by author or by skill), none are fetched from Qdrant again"""
+    if not any(excluded.values()):
+        return None
+    return ranker.catalog.excluded_ids(**excluded)
+
 
-ranks = dict()
+def merge_exclusions(excluded: dict, new: dict) -> dict:
+    return {
+        key: list(dict.fromkeys(excluded.get(key, []) + new.get(key, [])))
+        for key in ("courses", "authors", "skills")
+    }
 
-app = FastAPI()
+
+async def save_ranking(user_id, ranked_courses, context: dict):
+    ids, scores = ranked_courses.compact()
+    await asyncio.to_thread(ranking_store.put, user_id, ids, scores, context)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    health_task = asyncio.create_task(search_engine.health.run())
+    yield
+    health_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await health_task
+    await search_engine.embedder.close()
+    await asyncio.to_thread(search_engine.save_local_index)
+    ranking_store.close()
+
+app = FastAPI(lifespan=lifespan)
+
+@app.exception_handler(QdrantUnavailableError)
+async def qdrant_unavailable_handler(request: Request, exc: QdrantUnavailableError):
+    # circuit is open, the caller can retry once it resets
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
 
 @app.get("/user_skills/")
 async def get_user_skills() -> set:
     return USER_SKILLS
 
+@app.get("/health/")
+async def get_health() -> dict:
+    return {
+        "qdrant": search_engine.health.status(),
+        "embedding_cache": search_engine.embedding_cache.stats(),
+        "ranking_store": ranking_store.stats()
+    }
+
 @app.post("/courses/")
 async def create_course(course: ResourceSend):
-    search_engine.insert_resource(course)
+    await asyncio.to_thread(search_engine.insert_resource, course)
+    course_id = str(course.resource_id)
+    # an existing course keeps its author and rating, only title and skills come with the request
+    row = ranker.catalog.row_by_id.get(course_id)
+    known = ranker.catalog.courses[row] if row is not None else {}
+    ranker.catalog.add({
+        "id": course_id,
+        **search_engine.project_payload({**known, "title": course.title, "skills": course.skills})
+    })
 
 @app.post("/generate_roadmap/")
 async def generate_roadmap(data: RoadmapData) -> RoadmapResponse:
     missing_skills = analyzer.compute_gap(data.user_skills, data.user_role)['missing_skills']
+    # exclusions from the feedback on previous roadmaps stay while the role is the same
+    previous = await asyncio.to_thread(ranking_store.get, data.user_id)
+    excluded = kept_exclusions(previous["context"], data.user_role) if previous else {}
     # upd to search better
-    best_courses = search_engine.get_courses(data.user_role, data.user_query, data.user_skills)
+    best_courses = await search_engine.get_courses_async(data.user_role, data.user_query, data.user_skills,
+                                                         exclude_ids(excluded))
     # upd to improved ranking
-    ranked_courses = ranker.rank_with_fallback(best_courses, missing_skills, data.user_skills, data.user_role)
+    ranked_courses = ranker.rank_with_fallback(best_courses, missing_skills, data.user_skills, data.user_role,
+                                               limit=ROADMAP_LENGTH)
 
-    ranks[data.user_id] = ranked_courses
+    await save_ranking(data.user_id, ranked_courses,
+                       {"role": data.user_role, "skills": data.user_skills, "query": data.user_query,
+                        "excluded": excluded})
 
     logger.info(f"Ranked courses sample: {ranked_courses[:3]}")
 
     nodes = []
-    for idx, course_entry in enumerate(ranked_courses[:10]):
+    for idx, course_entry in enumerate(ranked_courses[:ROADMAP_LENGTH]):
         node = {
             "node_id": idx,
             "resource_id": course_entry["course"]["id"]
@@ -84,15 +203,17 @@ async def generate_roadmap(data: RoadmapData) -> RoadmapResponse:
 
 @app.post("/update_roadmap/")
 async def update_roadmap(data: RoadmapUpdateData) -> RoadmapResponse:
-    ranked_courses = ranker.update_ranking(
-        ranks[data.user_id],
+    ranked, context = await load_ranking(data.user_id, data.user_role, data.user_skills)
+    ranked_courses, exclusions = ranker.update_ranking(
+        ranked,
         data.reasons,
-        data.user_skills,
-        data.user_role
+        context["skills"],
+        context["role"]
     )
-    ranks[data.user_id] = ranked_courses
+    context["excluded"] = merge_exclusions(context["excluded"], exclusions)
+    await save_ranking(data.user_id, ranked_courses, context)
     nodes = []
-    for idx, course_entry in enumerate(ranked_courses[:10]):
+    for idx, course_entry in enumerate(ranked_courses[:ROADMAP_LENGTH]):
         node = {
             "node_id": idx,
             "resource_id": course_entry["course"]["id"]
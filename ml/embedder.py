@@ -0,0 +1,135 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingExecutor:
+    """
+    Runs SentenceTransformer inference off the event loop.
+    Concurrent encode() calls are merged into one model.encode(batch)
+    when they arrive within max_wait_ms of each other or until
+    max_batch_size texts are collected. Batches are encoded in a thread
+    pool (torch releases the GIL during inference), so several batches
+    can run in parallel.
+    """
+
+    def __init__(self, model, max_batch_size: int = None, max_wait_ms: float = None, workers: int = None,
+                 cache: EmbeddingCache = None):
+        self.model = model
+        self.cache = cache
+        if max_batch_size is None:
+            max_batch_size = int(os.getenv("EMBED_MAX_BATCH", 64))
+        if max_wait_ms is None:
+            max_wait_ms = float(os.getenv("EMBED_MAX_WAIT_MS", 5))
+        if workers is None:
+            workers = int(os.getenv("EMBED_WORKERS", os.cpu_count() or 1))
+
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.workers = workers
+
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="embed")
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._inflight = set()
+
+    def _ensure_started(self):
+        if self._batcher is None or self._batcher.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.workers)
+            self._batcher = asyncio.create_task(self._run())
+            logger.info(f"Started embedding batcher: batch={self.max_batch_size}, "
+                        f"wait={self.max_wait * 1000:.1f}ms, workers={self.workers}")
+
+    def encode_sync(self, texts: List[str]) -> np.ndarray:
+        vectors = self.model.encode(texts, batch_size=self.max_batch_size, convert_to_numpy=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """encode texts, returns matrix with one row per text"""
+        if self.cache is None:
+            return await self._submit(texts)
+
+        # the disk tier reads and writes a memmap and rewrites its index, off the event loop
+        vectors = await asyncio.to_thread(self.cache.get_many, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = await self._submit([texts[i] for i in missing])
+            await asyncio.to_thread(self.cache.put_many, [texts[i] for i in missing], encoded)
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+        return np.stack(vectors)
+
+    async def _submit(self, texts: List[str]) -> np.ndarray:
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        size = len(batch[0][0])
+        deadline = loop.time() + self.max_wait
+
+        while size < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            size += len(item[0])
+
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            await self._slots.acquire()
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: list):
+        loop = asyncio.get_running_loop()
+        try:
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            vectors = await loop.run_in_executor(self._pool, self.encode_sync, texts)
+
+            offset = 0
+            for item_texts, future in batch:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(batch)} requests failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    async def close(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            self._batcher = None
+        self._pool.shutdown(wait=False)
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.flush)
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+import numpy as np
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+class DiskEmbeddingStore:
+    """
+    On-disk tier: vectors in a memory-mapped .npy matrix,
+    row index in a json file next to it. Survives restarts.
+    Holds at most max_rows vectors, once full the oldest row is overwritten.
+    The index is written every flush_every puts, so after a crash it can point
+    a key at a row that was overwritten since. A hash of the key is stored next
+    to each row and checked on get, a mismatch is a miss.
+    """
+
+    def __init__(self, path: str, dim: int, capacity: int = 1024, flush_every: int = 64,
+                 max_rows: int = None):
+        self.path = path
+        self.dim = dim
+        self.flush_every = flush_every
+        self.max_rows = max_rows or int(os.getenv("EMBED_DISK_CACHE_SIZE", 50000))
+        self._vectors_path = os.path.join(path, "vectors.npy")
+        self._hashes_path = os.path.join(path, "hashes.npy")
+        self._index_path = os.path.join(path, "index.json")
+        self._unflushed = 0
+        self._next = 0  # row overwritten next once the store is full
+
+        os.makedirs(path, exist_ok=True)
+        self.keys: List[str] = []
+        if all(map(os.path.exists, (self._index_path, self._vectors_path, self._hashes_path))):
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            vectors = np.load(self._vectors_path, mmap_mode="r+")
+            hashes = np.load(self._hashes_path, mmap_mode="r+")
+            if index.get("dim") == dim and len(hashes) == len(vectors) >= len(index["keys"]):
+                self.keys = index["keys"][:self.max_rows]
+                self._next = index.get("next", 0) % max(len(self.keys), 1)
+                self.vectors, self.hashes = vectors, hashes
+            else:
+                logger.warning(f"Embedding store {path} does not match dim {dim}; rebuilding")
+        elif os.path.exists(self._index_path):
+            logger.warning(f"Embedding store {path} has no key hashes; rebuilding")
+
+        if not self.keys:
+            self.vectors, self.hashes = self._allocate(capacity)
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        logger.info(f"Opened embedding store {path} with {len(self.keys)} vectors")
+
+    def _allocate(self, capacity: int):
+        vectors = np.lib.format.open_memmap(
+            self._vectors_path, mode="w+", dtype=np.float32, shape=(capacity, self.dim)
+        )
+        hashes = np.lib.format.open_memmap(
+            self._hashes_path, mode="w+", dtype=np.uint64, shape=(capacity,)
+        )
+        return vectors, hashes
+
+    def _grow(self):
+        old = np.array(self.vectors[:len(self.keys)])
+        old_hashes = np.array(self.hashes[:len(self.keys)])
+        del self.vectors, self.hashes
+        self.vectors, self.hashes = self._allocate(min(max(2 * len(old), 1024), self.max_rows))
+        self.vectors[:len(old)] = old
+        self.hashes[:len(old)] = old_hashes
+
+    @staticmethod
+    def _key_hash(key: str) -> int:
+        # never 0, which marks a row that is being written
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") | 1
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        row = self.rows.get(key)
+        if row is None:
+            return None
+        if int(self.hashes[row]) != self._key_hash(key):
+            # row was overwritten after the index was last written
+            del self.rows[key]
+            return None
+        return np.array(self.vectors[row])
+
+    def put(self, key: str, vector: np.ndarray):
+        if key in self.rows:
+            return
+        if len(self.keys) >= self.max_rows:
+            row = self._next
+            self._next = (row + 1) % self.max_rows
+            if self.rows.get(self.keys[row]) == row:
+                del self.rows[self.keys[row]]
+            self.keys[row] = key
+        else:
+            if len(self.keys) >= self.vectors.shape[0]:
+                self._grow()
+            row = len(self.keys)
+            self.keys.append(key)
+        self.hashes[row] = 0
+        self.vectors[row] = vector
+        self.hashes[row] = self._key_hash(key)
+        self.rows[key] = row
+
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self.vectors.flush()
+        self.hashes.flush()
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"dim": self.dim, "keys": self.keys, "next": self._next}, f)
+        os.replace(tmp_path, self._index_path)
+        self._unflushed = 0
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of embeddings keyed by normalized text,
+    with an optional on-disk tier behind it.
+    """
+
+    def __init__(self, max_size: int = None, disk_path: str = None):
+        if max_size is None:
+            max_size = int(os.getenv("EMBED_CACHE_SIZE", 4096))
+        if disk_path is None:
+            disk_path = os.getenv("EMBED_CACHE_DIR")
+
+        self.max_size = max_size
+        self.disk_path = disk_path
+        self.disk: Optional[DiskEmbeddingStore] = None
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        if disk_path and os.path.exists(os.path.join(disk_path, "index.json")):
+            with open(os.path.join(disk_path, "index.json"), 'r', encoding='utf-8') as f:
+                dim = json.load(f).get("dim")
+            self.disk = DiskEmbeddingStore(disk_path, dim=dim)
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        # case is kept, the model gives "Python" and "python" different vectors
+        return " ".join((text or "").split())
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._memory),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "disk_size": len(self.disk.keys) if self.disk else 0,
+        }
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """cached vectors for texts, None where a text has to be encoded"""
+        result = []
+        with self._lock:
+            for text in texts:
+                key = self.normalize(text)
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                elif self.disk is not None and (vector := self.disk.get(key)) is not None:
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+                result.append(vector)
+        return result
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        with self._lock:
+            if self.disk is None and self.disk_path and len(vectors):
+                self.disk = DiskEmbeddingStore(self.disk_path, dim=vectors.shape[1])
+            for text, vector in zip(texts, vectors):
+                key = self.normalize(text)
+                self._remember(key, vector)
+                if self.disk is not None:
+                    self.disk.put(key, vector)
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """encode only the texts that are not cached, returns float32 matrix"""
+        vectors = self.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = encode_fn([texts[i] for i in missing])
+            self.put_many([texts[i] for i in missing], encoded)
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+        return np.stack(vectors).astype(np.float32, copy=False)
+
+    def flush(self):
+        with self._lock:
+            if self.disk is not None:
+                self.disk.flush()
@@ -0,0 +1,224 @@
+import json
+import os
+import threading
+from typing import Dict, List
+
+import numpy as np
+from qdrant_client.models import ScoredPoint
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+class LocalVectorIndex:
+    """
+    Exact in-process search over the whole course catalog.
+    The named vectors of every course are L2-normalized and stored side by side
+    in one (n_courses, n_vectors * dim) matrix, so a weighted cosine score
+    over all vectors is a single matrix-vector product:
+        scores = M @ concat(w_title * q_title, w_desc * q_desc, w_skills * q_skills)
+    The matrix lives in a .npy file and is memory-mapped on load.
+    With quantize=True it is stored as int8 (x * 127), 4x smaller, slightly less exact.
+
+    New courses are written into spare rows of a buffer that doubles when full, a course
+    added again gets a new row and its old row is masked out. Searches read one
+    (matrix, size, dead rows) snapshot that add() publishes after the row is written,
+    so a concurrent search never sees a half-inserted course.
+    """
+
+    INT8_SCALE = 127.0
+    MIN_CAPACITY = 64
+
+    def __init__(self, vector_names: List[str], matrix: np.ndarray, ids: list, payloads: list):
+        self.vector_names = vector_names
+        self.ids = list(ids)
+        self.payloads = list(payloads)
+        self.dim = matrix.shape[1] // len(vector_names)
+        self.row_by_id = {point_id: row for row, point_id in enumerate(self.ids)}
+        self.dirty = False  # added courses that are not saved yet
+
+        self._lock = threading.Lock()
+        self._view = (matrix, len(self.ids), frozenset())  # (buffer, used rows, dead rows)
+
+    def __len__(self):
+        return len(self.row_by_id)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        matrix, size, _ = self._view
+        return matrix[:size]
+
+    @property
+    def quantized(self) -> bool:
+        return self._view[0].dtype == np.int8
+
+    def items(self):
+        """(id, payload) of every course in the index"""
+        for point_id, row in list(self.row_by_id.items()):
+            yield point_id, self.payloads[row]
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    @classmethod
+    def _encode_rows(cls, rows: np.ndarray, quantize: bool) -> np.ndarray:
+        if quantize:
+            return np.round(rows * cls.INT8_SCALE).astype(np.int8)
+        return rows.astype(np.float32, copy=False)
+
+    @classmethod
+    def build_from_qdrant(cls, client, collection_name: str, vector_names: List[str],
+                          payload_fields: List[str], quantize: bool = False,
+                          batch_size: int = 256) -> "LocalVectorIndex":
+        """scroll the whole collection once and keep vectors and projected payloads in memory"""
+        logger.info(f"Building local vector index from Qdrant collection '{collection_name}'")
+        ids, payloads, rows = [], [], []
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name=collection_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=payload_fields,
+                with_vectors=vector_names
+            )
+            for point in points:
+                ids.append(point.id)
+                payloads.append(point.payload or {})
+                rows.append(np.concatenate([
+                    cls._normalize(point.vector[name]) for name in vector_names
+                ]))
+            if offset is None:
+                break
+
+        matrix = cls._encode_rows(np.vstack(rows), quantize) if rows else \
+            np.zeros((0, 0), dtype=np.int8 if quantize else np.float32)
+        logger.info(f"Local vector index built: {matrix.shape}, dtype {matrix.dtype}")
+        return cls(vector_names, matrix, ids, payloads)
+
+    def save(self, path: str):
+        """write the live rows only, replaced and spare rows are dropped"""
+        with self._lock:
+            matrix, _, _ = self._view
+            rows = sorted(self.row_by_id.values())
+            ids = [self.ids[row] for row in rows]
+            payloads = [self.payloads[row] for row in rows]
+            matrix = np.asarray(matrix[rows]) if rows else matrix[:0]
+            self.dirty = False
+
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), matrix)
+        with open(os.path.join(path, "meta.json"), 'w', encoding='utf-8') as f:
+            json.dump({
+                "vector_names": self.vector_names,
+                "ids": ids,
+                "payloads": payloads
+            }, f)
+        logger.info(f"Saved local vector index with {len(ids)} courses to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "LocalVectorIndex":
+        with open(os.path.join(path, "meta.json"), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        matrix = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        logger.info(f"Loaded local vector index {matrix.shape} from {path}")
+        return cls(meta["vector_names"], matrix, meta["ids"], meta["payloads"])
+
+    @classmethod
+    def load_or_build(cls, path: str, client, collection_name: str, vector_names: List[str],
+                      payload_fields: List[str], quantize: bool = False) -> "LocalVectorIndex":
+        """saved index from path, built again if Qdrant has a different number of courses"""
+        if os.path.exists(os.path.join(path, "meta.json")):
+            index = cls.load(path)
+            try:
+                count = client.count(collection_name=collection_name, exact=True).count
+            except Exception as e:
+                logger.warning(f"Could not check local vector index against Qdrant, using it as is: {e}")
+                return index
+            if count == len(index):
+                return index
+            logger.info(f"Local vector index has {len(index)} courses, Qdrant has {count}, rebuilding")
+        index = cls.build_from_qdrant(client, collection_name, vector_names, payload_fields, quantize)
+        index.save(path)
+        return index
+
+    def add(self, point_id, vectors: Dict[str, np.ndarray], payload: dict):
+        """insert or replace one course, amortized O(1) rows copied"""
+        row = np.concatenate([self._normalize(vectors[name]) for name in self.vector_names])
+        row = self._encode_rows(row[None, :], self.quantized)[0]
+        with self._lock:
+            matrix, size, dead = self._view
+            # memory-mapped file is read-only, it is copied once into a growable buffer
+            if size == len(matrix) or not matrix.flags.writeable or matrix.shape[1] != len(row):
+                grown = np.empty((max(2 * size, self.MIN_CAPACITY), len(row)), dtype=row.dtype)
+                if size:
+                    grown[:size] = matrix[:size]
+                matrix = grown
+            matrix[size] = row
+
+            self.ids.append(point_id)
+            self.payloads.append(payload)
+            old_row = self.row_by_id.get(point_id)
+            if old_row is not None:
+                dead = dead | {old_row}
+            self.row_by_id[point_id] = size
+            self.dim = len(row) // len(self.vector_names)
+            self._view = (matrix, size + 1, dead)
+            self.dirty = True
+
+    def search(self, vectors: Dict[str, np.ndarray], weights: Dict[str, float], limit: int,
+               exclude_ids=None) -> List[Dict]:
+        """
+        top-limit courses by weighted cosine score, same item shape as the Qdrant search paths:
+        {'point', 'weighted_score', 'original_scores'}; exclude_ids are never returned
+        """
+        matrix, size, dead = self._view
+        if not size:
+            return []
+        matrix = matrix[:size]
+        quantized = matrix.dtype == np.int8
+
+        query = np.concatenate([
+            weights[name] * self._normalize(vectors[name]) for name in self.vector_names
+        ]).astype(np.float32)
+        scores = matrix @ query
+        if quantized:
+            scores = scores / self.INT8_SCALE
+        excluded = {self.row_by_id[point_id] for point_id in exclude_ids or () if point_id in self.row_by_id}
+        # rows added after the snapshot are not in it
+        excluded = [row for row in excluded | dead if row < size]
+        if excluded:
+            scores = np.array(scores, dtype=np.float32)
+            scores[excluded] = -np.inf
+
+        k = min(limit, size - len(excluded))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for row in top:
+            original_scores = {}
+            for i, name in enumerate(self.vector_names):
+                block = np.asarray(matrix[row, i * self.dim:(i + 1) * self.dim], dtype=np.float32)
+                if quantized:
+                    block = block / self.INT8_SCALE
+                original_scores[name] = float(block @ self._normalize(vectors[name]))
+
+            point = ScoredPoint(id=self.ids[row], version=0, score=float(scores[row]),
+                                payload=self.payloads[row])
+            results.append({
+                'point': point,
+                'weighted_score': float(scores[row]),
+                'original_scores': original_scores
+            })
+        return results
@@ -12,7 +12,7 @@ class RoadmapData(BaseModel):
 
 class RoadmapUpdateData(BaseModel):
     user_id: UUID
-    reasons: dict[str, str]  # node_id -> reason
+    reasons: dict[str, str]  # resource_id (or node index) -> reason
     user_skills: Optional[List[str]] = None
     user_role: Optional[str] = None
 
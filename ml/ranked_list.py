@@ -0,0 +1,206 @@
+from collections import defaultdict
+from typing import Dict, List
+
+import numpy as np
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+class CourseCatalog:
+    """
+    Metadata of every course the ranker has seen, one row per course id.
+    Shared by all rankings, so a ranking only keeps integer rows into it.
+    Inverted indexes author -> rows and canonical skill -> rows turn feedback
+    exclusions into set lookups instead of payload scans.
+    """
+
+    def __init__(self, skill_index=None):
+        self.skill_index = skill_index
+        self.ids = []
+        self.courses: List[Dict] = []
+        self.row_by_id = {}
+
+        # author -> id and canonical skill -> id
+        self.author_ids: Dict[str, int] = {}
+        self.skill_ids: Dict[str, int] = {}
+        self.skill_names: List[str] = []
+        self.course_author: List[int] = []  # -1 for unknown author
+        self.course_skills: List[frozenset] = []
+
+        self.author_rows: Dict[int, set] = defaultdict(set)
+        self.skill_rows: Dict[int, set] = defaultdict(set)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _canonical(self, skill: str) -> str:
+        return self.skill_index.canonical(skill) if self.skill_index is not None else skill
+
+    def skill_id(self, skill: str) -> int:
+        skill = self._canonical(skill)
+        skill_id = self.skill_ids.get(skill)
+        if skill_id is None:
+            skill_id = self.skill_ids[skill] = len(self.skill_names)
+            self.skill_names.append(skill)
+        return skill_id
+
+    def add(self, course: Dict) -> int:
+        """insert or refresh one course, returns its row"""
+        author = course.get("author")
+        author = self.author_ids.setdefault(author, len(self.author_ids)) if author is not None else -1
+        skills = frozenset(self.skill_id(skill) for skill in course.get("skills") or [])
+
+        row = self.row_by_id.get(course["id"])
+        if row is None:
+            row = len(self.ids)
+            self.row_by_id[course["id"]] = row
+            self.ids.append(course["id"])
+            self.courses.append(course)
+            self.course_author.append(author)
+            self.course_skills.append(skills)
+        else:
+            self.author_rows[self.course_author[row]].discard(row)
+            for skill in self.course_skills[row]:
+                self.skill_rows[skill].discard(row)
+            self.courses[row] = course
+            self.course_author[row] = author
+            self.course_skills[row] = skills
+
+        if author >= 0:
+            self.author_rows[author].add(row)
+        for skill in skills:
+            self.skill_rows[skill].add(row)
+        return row
+
+    def add_many(self, courses) -> np.ndarray:
+        return np.fromiter((self.add(course) for course in courses), dtype=np.int64)
+
+    def excluded_rows(self, rows=(), authors=(), skills=()) -> set:
+        """given rows plus every course of the authors and every course having any of the skills (ids)"""
+        excluded = set(rows)
+        for author in authors:
+            excluded |= self.author_rows.get(author, set())
+        for skill in skills:
+            excluded |= self.skill_rows.get(skill, set())
+        return excluded
+
+    def excluded_ids(self, courses=(), authors=(), skills=()) -> list:
+        """course ids to keep out of the search, from stored course ids, author names and skill names"""
+        rows = self.excluded_rows(
+            [self.row_by_id[course_id] for course_id in courses if course_id in self.row_by_id],
+            [self.author_ids[author] for author in authors if author in self.author_ids],
+            [self.skill_ids[skill] for skill in map(self._canonical, skills) if skill in self.skill_ids]
+        )
+        return list(set(courses) | {self.ids[row] for row in rows})
+
+
+class RankedList:
+    """
+    Ranked courses as parallel arrays: catalog row, ranking score and packed bitmask
+    of covered gap skills. Result dicts {'course', 'ranking_score', 'covered_skills'}
+    are built only for the items that are read.
+
+    A ranking can keep an unordered rest (top-k selection); it is sorted by score
+    and appended only when something past the ordered head is read.
+    """
+
+    def __init__(self, catalog: CourseCatalog, rows: np.ndarray, scores: np.ndarray, masks: np.ndarray,
+                 gap: List[str], rest=None):
+        self.catalog = catalog
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.masks = masks
+        self.gap = gap
+        self._rest = rest if rest is not None and len(rest[0]) else None
+
+    def __len__(self):
+        return len(self.rows) + (len(self._rest[0]) if self._rest is not None else 0)
+
+    def settle(self):
+        """order the rest and append it, needed before working with rows directly"""
+        if self._rest is None:
+            return
+        rows, scores, masks = self._rest
+        order = np.argsort(-scores, kind="stable")
+        self.rows = np.concatenate([self.rows, rows[order]])
+        self.scores = np.concatenate([self.scores, scores[order]])
+        self.masks = np.concatenate([self.masks, masks[order]])
+        self._rest = None
+
+    def item(self, pos: int) -> Dict:
+        if pos >= len(self.rows):
+            self.settle()
+        covered = np.unpackbits(self.masks[pos], count=len(self.gap), bitorder="little")
+        return {
+            "course": self.catalog.courses[self.rows[pos]],
+            "ranking_score": float(self.scores[pos]),
+            "covered_skills": [self.gap[col] for col in np.flatnonzero(covered).tolist()]
+        }
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if stop > len(self.rows) or step < 0:
+                self.settle()
+            return self.take(np.arange(start, stop, step))
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("ranked list index out of range")
+        return self.item(key)
+
+    def __iter__(self):
+        self.settle()
+        for pos in range(len(self.rows)):
+            yield self.item(pos)
+
+    def __eq__(self, other):
+        if isinstance(other, (RankedList, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"RankedList({list(self)!r})"
+
+    @property
+    def ids(self) -> list:
+        self.settle()
+        return [self.catalog.ids[row] for row in self.rows.tolist()]
+
+    def compact(self):
+        """(course ids, ranking scores) of the whole ranking"""
+        return self.ids, self.scores.tolist()
+
+    def courses(self) -> List[Dict]:
+        self.settle()
+        return [self.catalog.courses[row] for row in self.rows.tolist()]
+
+    def take(self, positions) -> "RankedList":
+        """new ranking of the items at positions, in that order"""
+        positions = np.asarray(positions, dtype=np.int64)
+        if positions.size and positions.max() >= len(self.rows):
+            self.settle()
+        return RankedList(self.catalog, self.rows[positions], self.scores[positions],
+                          self.masks[positions], self.gap)
+
+    def filter(self, keep: np.ndarray) -> "RankedList":
+        """items where the boolean keep mask is True, order is preserved"""
+        self.settle()
+        return self.take(np.flatnonzero(keep))
+
+    def covered(self) -> np.ndarray:
+        """boolean (n, len(gap)) coverage matrix back from the packed bitmasks"""
+        self.settle()
+        return np.unpackbits(self.masks, axis=1, count=len(self.gap), bitorder="little").astype(bool)
+
+    def move(self, pos: int, new_pos: int) -> "RankedList":
+        """pop the item at pos and insert it at new_pos of the remaining list"""
+        self.settle()
+        positions = np.delete(np.arange(len(self.rows)), pos)
+        return self.take(np.insert(positions, min(new_pos, len(positions)), pos))
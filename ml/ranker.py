@@ -1,8 +1,10 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import numpy as np
-import re
 import random
 
+from skill_index import SkillIndex
+from ranked_list import CourseCatalog, RankedList
+
 import logging
 
 logging.basicConfig(
@@ -11,6 +13,7 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
 class CourseRanker:
     STRATEGIES = {
         "basic": {
@@ -47,15 +50,19 @@ class CourseRanker:
             # Control concentration of good courses by shuffling and small penalties
             "weights": {"coverage": 0.5, "priority": 0.4, "rating": 0.1},
             "filter_low_quality": False,
-            "diversity_penalty_weight": 0.2,
-            "known_skills_penalty_weight": 0.1,
+            "diversity_penalty": 0.2,
+            "known_skills_penalty": 0.1,
             "position_bias_shuffle": True,
             "max_top_similar_courses": 3,  # max # similar in skills sets courses
         }
     #     todo: add strategies to re-rank based on feedback (if needed)
     }
 
-    def __init__(self, priorities_by_role: Dict[str, Dict[str, int]], skill_gap_analyzer=None, rating_max: float = 5.0):
+    # per-course features, strategy weights are taken in this order
+    FEATURES = ("coverage", "priority", "rating")
+
+    def __init__(self, priorities_by_role: Dict[str, Dict[str, int]], skill_gap_analyzer=None, rating_max: float = 5.0,
+                 skill_index: SkillIndex = None):
         self.priorities_by_role = priorities_by_role
         self.rating_max = rating_max
         self.skill_gap_analyzer = skill_gap_analyzer
@@ -70,6 +77,15 @@ class CourseRanker:
 
         self.buffer_zone = []  # unavailable courses to delete from db
 
+        # how many top positions diversity penalty fills greedily
+        self.diversity_top_k = 30
+
+        # raw course skills -> integer word ids, shared with the gap analyzer
+        self.skill_index = skill_index or SkillIndex()
+
+        # metadata of ranked courses, rankings keep only rows into it
+        self.catalog = CourseCatalog(self.skill_index)
+
     def get_metrics(self):
         return self.last_metrics
 
@@ -80,69 +96,61 @@ class CourseRanker:
             if c.get("skills") and (c.get("rating", 0) or 0) >= 3
         ]
 
-    def _limit_similar_courses(self, ranked: List[Dict], max_similar: int) -> List[Dict]:
+    def _limit_similar_courses(self, order: List[int], skill_masks: List[int], max_similar: int) -> List[int]:
         """
         reduce number of courses with similar skills sets to max_similar.
         similarity defines as nof intersected skills >= 50% smaller set
+        order - ranked course positions, skill_masks - covered gap columns of every course as int bitmask,
+        so intersection size is a popcount of AND
         """
+        if max_similar <= 0:
+            return []
+
         limited = []
-        skill_sets = []
-
-        def is_similar(skills1, skills2):
-            set1, set2 = set(skills1), set(skills2)
-            intersection = len(set1.intersection(set2))
-            threshold = min(len(set1), len(set2)) * 0.5
-            return intersection >= threshold
-
-        for item in ranked:
-            skills = item["covered_skills"]
-            similar_count = sum(is_similar(skills, s) for s in skill_sets)
-            if similar_count < max_similar:
-                limited.append(item)
-                skill_sets.append(skills)
-            # esle - skip course
+        kept = []  # (mask, nof skills) of kept courses
+
+        for i in order:
+            mask = skill_masks[i]
+            size = mask.bit_count()
+            similar_count = 0
+            for other, other_size in kept:
+                if 2 * (mask & other).bit_count() >= min(size, other_size):
+                    similar_count += 1
+                    if similar_count >= max_similar:
+                        # esle - skip course, no need to count the rest
+                        break
+            else:
+                limited.append(i)
+                kept.append((mask, size))
 
         return limited
 
-    def _shuffle_similar_scores(self, ranked: List[Dict], epsilon: float = 0.01) -> List[Dict]:
+    def _shuffle_similar_scores(self, order: List[int], scores: List[float], epsilon: float = 0.01) -> List[int]:
         """
         shuffle courses with similar scores (diff <= epsilon), to reduce position bias.
         """
-        if not ranked:
-            return ranked
+        if not order:
+            return order
 
         shuffled = []
-        buffer = [ranked[0]]
+        buffer = [order[0]]
 
-        for i in range(1, len(ranked)):
-            prev_score = buffer[-1]["ranking_score"]
-            curr_score = ranked[i]["ranking_score"]
+        for i in order[1:]:
+            prev_score = scores[buffer[-1]]
+            curr_score = scores[i]
 
             if abs(curr_score - prev_score) <= epsilon:
-                buffer.append(ranked[i])
+                buffer.append(i)
             else:
                 random.shuffle(buffer)
                 shuffled.extend(buffer)
-                buffer = [ranked[i]]
+                buffer = [i]
 
         random.shuffle(buffer)
         shuffled.extend(buffer)
 
         return shuffled
 
-    def normalize_skill(self, skill: str) -> str:
-        skill = skill.lower()
-        skill = re.sub(r"[^a-z0-9\s]", "", skill)
-        return skill.strip()
-
-    def get_skill_words(self, skills: list[str]) -> set[str]:
-        words = set()
-        for skill in skills:
-            normalized = self.normalize_skill(skill)
-            splited = normalized.split()
-            words.update(splited)
-        return words
-
     def prepare_courses(self, search_results: List[Dict]) -> List[Dict]:
         """
         Converts raw search results to format expected by ranking logic
@@ -165,94 +173,206 @@ class CourseRanker:
 
         return courses
 
-    def rank_courses(self,
-                     courses: List[Dict], # from cosine similarity search
-                     skill_gap: List[str], #from skillgap
-                     known_skills: List[str],
-                     target_role: str, # from user onboarding info
-                     weights: Dict[str, float] = None, # alpha beta for ranking
-                     strategy_name: str = "basic" # to recalculate if offline metrics are bad
-                     ) -> List[Dict]:
-        #identify startegy
-        strategy = self.STRATEGIES.get(strategy_name, self.STRATEGIES["basic"])
-
-        # choose weights of strategy
-        if weights is None:
-            weights = strategy["weights"]
+    def course_skill_ids(self, raw_course_skills) -> np.ndarray:
+        """normalized skill words of a course as integer ids, see SkillIndex"""
+        return self.skill_index.course_ids(raw_course_skills)
 
+    def _coverage_matrix(self, courses: List[Dict], skill_gap: List[str]):
+        """
+        boolean courses x gap-skills matrix, True where a course covers a skill of the gap.
+        returns (matrix, gap) where gap is skill_gap without duplicates
+        """
+        gap = list(dict.fromkeys(skill_gap))
+        course_ids = [self.course_skill_ids(course.get("skills", [])) for course in courses]
+
+        # skill id -> column in the gap, -1 for skills outside of the gap
+        lookup = np.full(len(self.skill_index) + 1, -1, dtype=np.int64)
+        for col, skill in enumerate(gap):
+            skill_id = self.skill_index.lookup(skill)
+            if skill_id >= 0:
+                lookup[skill_id] = col
+
+        matrix = np.zeros((len(courses), len(gap)), dtype=bool)
+        if course_ids:
+            lengths = [len(ids) for ids in course_ids]
+            cols = lookup[np.concatenate(course_ids)] if sum(lengths) else np.empty(0, dtype=np.int64)
+            rows = np.repeat(np.arange(len(courses)), lengths)
+            keep = cols >= 0
+            matrix[rows[keep], cols[keep]] = True
+        return matrix, gap
+
+    def _diversified_order(self, covered: np.ndarray, score: np.ndarray, penalty: float, top_k: int):
+        """
+        Greedy MMR-style selection: each next course maximizes
+        score - penalty * mean overlap of its covered skills with already picked courses.
+        Summed overlap of every candidate with the picked set is updated incrementally
+        from the columns of the last pick only, so a step costs O(n * |skills of the pick|).
+        After top_k picks the rest is ordered by its penalized score against the picked set.
+        Returns (order, penalized scores).
+        """
+        n = len(score)
+        overlap = np.zeros(n, dtype=np.float64)
+        penalized = score.astype(np.float64, copy=True)
+        available = np.ones(n, dtype=bool)
+        order = []
+
+        for step in range(min(top_k, n)):
+            current = score - penalty * overlap / step if step else score
+            pick = int(np.argmax(np.where(available, current, -np.inf)))
+            # picked course keeps the score it had when it was picked
+            penalized[pick] = current[pick]
+            order.append(pick)
+            available[pick] = False
+            overlap += covered[:, covered[pick]].sum(axis=1)
+
+        rest = np.flatnonzero(available)
+        if order:
+            penalized[rest] = score[rest] - penalty * overlap[rest] / len(order)
+        rest = rest[np.argsort(-penalized[rest], kind="stable")]
+        order.extend(rest.tolist())
+        return order, penalized
+
+    def _features(self, courses: List[Dict], skill_gap: List[str], known_skills: List[str],
+                  target_role: str, coverage=None) -> Dict[str, Any]:
+        """
+        strategy-independent part of the ranking, computed once per request:
+        coverage matrix, per-course features (coverage, mean priority, rating)
+        as columns of one (n, 3) matrix, and overlap with known skills.
+        coverage - already known (matrix, gap), skips skill matching
+        """
         # get priorities from job-skills mapping
         priorities = self.priorities_by_role.get(target_role, {})
 
-        # known_skills = set(known_skills)
+        covered, gap = coverage if coverage is not None else self._coverage_matrix(courses, skill_gap)
+        n_covered = covered.sum(axis=1)
 
-        ranked = []
-        for course in courses:
-            # temporarily return kostyl normalizing
-            raw_course_skills = course.get("skills", [])
-            if isinstance(raw_course_skills, str):
-                try:
-                    import ast
-                    raw_course_skills = ast.literal_eval(raw_course_skills)
-                except Exception:
-                    raw_course_skills = []
+        # how many skills are covered by this course, the more the >>
+        coverage_score = n_covered / len(skill_gap) if skill_gap else np.zeros(len(courses))
 
-            course_skills = self.get_skill_words(raw_course_skills)
+        #how large is priority of skills for that course
+        gap_priorities = np.array([priorities.get(skill, 0.0) for skill in gap], dtype=np.float64)
+        priority_score_sum = covered @ gap_priorities
+        mean_priority_score = np.divide(priority_score_sum, n_covered,
+                                        out=np.zeros(len(courses)), where=n_covered > 0)
 
-            # logger.info(f"kostilno-normalized skills: {course_skills}")
+        ratings = np.array([
+            course["rating"] if course.get("rating") is not None else 0.3 * self.rating_max
+            for course in courses
+        ], dtype=np.float64)
+        rating_score = ratings / self.rating_max
 
-            # course_skills = course.get("skills", [])
+        known = set(known_skills)
+        known_mask = np.array([skill in known for skill in gap], dtype=np.int64)
 
-            covered_skills = set(course_skills).intersection(set(skill_gap))
-
-            # how many skills are covered by this course, the more the >>
-            coverage_score = len(covered_skills) / len(skill_gap) if skill_gap else 0
-
-            #how large is priority of skills for that course
-            priority_score_sum = sum(priorities.get(skill, 0.0) for skill in covered_skills)
-            mean_priority_score = priority_score_sum / len(covered_skills) if covered_skills else 0
-
-            raw_rating = course.get("rating", None)
-            rating = raw_rating if raw_rating is not None else 0.3 * self.rating_max
-            rating_score = rating / self.rating_max
-
-            score = (
-                    weights["coverage"] * coverage_score +
-                    weights["priority"] * mean_priority_score +
-                    weights["rating"] * rating_score
-            )
+        packed = np.packbits(covered, axis=1, bitorder="little")
 
-            # now penalties :(
+        return {
+            "covered": covered,
+            "gap": gap,
+            "gap_priorities": gap_priorities,
+            "matrix": np.column_stack([coverage_score, mean_priority_score, rating_score]),
+            "known_overlap": covered @ known_mask,
+            "packed": packed,
+            # same bits as python ints for the pairwise similarity checks
+            "skill_masks": [int.from_bytes(row.tobytes(), "little") for row in packed],
+        }
 
-            # diversity penalty — for intersection with already picked courses
-            if strategy["diversity_penalty"] > 0 and ranked:
-                overlap = 0
-                for prev in ranked:
-                    overlap += len(set(prev["covered_skills"]).intersection(covered_skills))
-                overlap /= len(ranked)
-                score -= strategy["diversity_penalty"] * overlap
+    @staticmethod
+    def _top_order(rounded: List[float], limit: int):
+        """
+        positions of the `limit` best scores in the same order as a full stable sort,
+        found with argpartition; returns (top positions, unordered rest positions)
+        """
+        neg = -np.array(rounded)
+        kth = np.partition(neg, limit - 1)[limit - 1]
+        # ties with the k-th score are all candidates, stable sort keeps the lower positions
+        candidates = np.flatnonzero(neg <= kth)
+        top = candidates[np.argsort(neg[candidates], kind="stable")][:limit]
+        rest = np.ones(len(neg), dtype=bool)
+        rest[top] = False
+        return top.tolist(), np.flatnonzero(rest)
+
+    def _strategy_order(self, features: Dict[str, Any], strategy: Dict[str, Any], score: np.ndarray,
+                        top_k: int = None, limit: int = None):
+        """
+        penalties, sorting, similar courses limit and shuffling of one strategy on top of its base score.
+        returns (course positions in ranked order, rounded scores, unordered rest).
+        with limit, a plain score sort is a top-limit selection and the rest is left unordered
+        """
+        rest = np.empty(0, dtype=np.int64)
+        covered = features["covered"]
 
-            # known skills penalty — for using skills that user know
-            if strategy["known_skills_penalty"] > 0:
-                known_overlap = len(set(known_skills).intersection(covered_skills))
-                score -= strategy["known_skills_penalty"] * known_overlap
+        # now penalties :(
 
-            ranked.append({
-                "course": course,
-                "ranking_score": round(score, 4),
-                "covered_skills": list(covered_skills)
-            })
+        # known skills penalty — for using skills that user know
+        if strategy["known_skills_penalty"] > 0:
+            score = score - strategy["known_skills_penalty"] * features["known_overlap"]
 
-        # sort by score
-        ranked = sorted(ranked, key=lambda x: x["ranking_score"], reverse=True)
+        # diversity penalty — for intersection with higher ranked courses
+        if strategy["diversity_penalty"] > 0 and len(score) > 1:
+            order, score = self._diversified_order(
+                covered, score, strategy["diversity_penalty"],
+                self.diversity_top_k if top_k is None else top_k
+            )
+            rounded = [round(value, 4) for value in score.tolist()]
+        else:
+            rounded = [round(value, 4) for value in score.tolist()]
+            plain = strategy.get("max_top_similar_courses") is None and not strategy.get("position_bias_shuffle")
+            if plain and limit is not None and limit < len(rounded):
+                order, rest = self._top_order(rounded, limit)
+            else:
+                # sort by score
+                order = np.argsort(-np.array(rounded), kind="stable").tolist()
 
         max_sim = strategy.get("max_top_similar_courses")
         if max_sim is not None:
-            ranked = self._limit_similar_courses(ranked, max_sim)
+            order = self._limit_similar_courses(order, features["skill_masks"], max_sim)
 
         if strategy.get("position_bias_shuffle"):
-            ranked = self._shuffle_similar_scores(ranked)
+            order = self._shuffle_similar_scores(order, rounded)
+
+        return order, rounded, rest
+
+    def _ranked(self, courses: List[Dict], features: Dict[str, Any], order: List[int], rounded: List[float],
+                rest: np.ndarray) -> RankedList:
+        """ranking arrays over the shared catalog, the unordered rest is sorted only when read"""
+        rows = self.catalog.add_many(courses)
+        scores = np.array(rounded, dtype=np.float64)
+        packed = features["packed"]
+        order = np.asarray(order, dtype=np.int64)
+        return RankedList(self.catalog, rows[order], scores[order], packed[order], features["gap"],
+                          rest=(rows[rest], scores[rest], packed[rest]))
+
+    def restore_ranking(self, search_res: List[Dict], scores: List[float], skill_gap: List[str],
+                        target_role: str) -> RankedList:
+        """ranking from stored course order and scores, covered skills are recomputed for the current gap"""
+        courses = self.prepare_courses(search_res)
+        features = self._features(courses, skill_gap, [], target_role)
+        return RankedList(self.catalog, self.catalog.add_many(courses), scores, features["packed"],
+                          features["gap"])
 
-        return ranked
+    def rank_courses(self,
+                     courses: List[Dict], # from cosine similarity search
+                     skill_gap: List[str], #from skillgap
+                     known_skills: List[str],
+                     target_role: str, # from user onboarding info
+                     weights: Dict[str, float] = None, # alpha beta for ranking
+                     strategy_name: str = "basic", # to recalculate if offline metrics are bad
+                     top_k: int = None, # greedy diversified positions, defaults to diversity_top_k
+                     limit: int = None # how many top courses to order, the rest is sorted lazily
+                     ) -> RankedList:
+        #identify startegy
+        strategy = self.STRATEGIES.get(strategy_name, self.STRATEGIES["basic"])
+
+        # choose weights of strategy
+        if weights is None:
+            weights = strategy["weights"]
+
+        features = self._features(courses, skill_gap, known_skills, target_role)
+        score = features["matrix"] @ np.array([weights[key] for key in self.FEATURES], dtype=np.float64)
+
+        order, rounded, rest = self._strategy_order(features, strategy, score, top_k, limit)
+        return self._ranked(courses, features, order, rounded, rest)
 
 
     def evaluate_ranking(self,
@@ -260,34 +380,38 @@ class CourseRanker:
                          target_role: str,
                          k: int = 10 # top-k
                          ) -> Dict[str, float]:
+        """skill gain, diversity and position bias of a ranking given as dicts, see _evaluate_order"""
         priorities = self.priorities_by_role.get(target_role, {})
-
-        # Skill Gain: priorities of covered skills in top-k courses
         top_k = ranked_courses[:k]
-        skill_gain = sum(
-            priorities.get(skill, 0.0)
-            for item in top_k
-            for skill in item["covered_skills"]
-        )
-
-        # Diversity: entropy(variety) of skills in top-k
-        from collections import Counter
-        all_skills = [s for item in top_k for s in item["covered_skills"]]
-        skill_counts = Counter(all_skills)
-        total = sum(skill_counts.values())
+        skills = list(dict.fromkeys(skill for item in top_k for skill in item["covered_skills"]))
+        column = {skill: i for i, skill in enumerate(skills)}
+
+        covered = np.zeros((len(top_k), len(skills)), dtype=bool)
+        for row, item in enumerate(top_k):
+            covered[row, [column[skill] for skill in item["covered_skills"]]] = True
+
+        features = {
+            "covered": covered,
+            "gap_priorities": np.array([priorities.get(skill, 0.0) for skill in skills], dtype=np.float64)
+        }
+        return self._evaluate_order(features, list(range(len(top_k))), k)
+
+    def _evaluate_order(self, features: Dict[str, Any], order: List[int], k: int = 10) -> Dict[str, float]:
+        """skill gain, diversity and position bias from course positions and the coverage matrix"""
+        top = np.asarray(order[:k], dtype=np.int64)
+        covered = features["covered"][top]
+        gains = covered @ features["gap_priorities"]
+
+        skill_gain = float(gains.sum())
+
+        counts = covered.sum(axis=0)
+        counts = counts[counts > 0]
         diversity_score = 0.0
-        if total > 0:
-            diversity_score = -sum(
-                (count / total) * np.log2(count / total)
-                for count in skill_counts.values()
-            )
+        if counts.size:
+            p = counts / counts.sum()
+            diversity_score = float(-(p * np.log2(p)).sum())
 
-        # Position bias: how necessary skills are concentrated in the upper positions
-        position_bias = sum(
-            priorities.get(skill, 0.0) / np.log2(idx + 2)
-            for idx, item in enumerate(top_k)
-            for skill in item["covered_skills"]
-        )
+        position_bias = float((gains / np.log2(np.arange(len(top)) + 2)).sum())
 
         return {
             "skill_gain": round(skill_gain, 4),
@@ -313,11 +437,37 @@ class CourseRanker:
                            skill_gap: List[str],
                            known_skills: List[str],
                            target_role: str,
-                           max_attempts: int = 5 #attenpt to improve 3 times
-                           ) -> List[Dict]:
-        """Cyclic ranks with different strategies until offline metrics are better"""
+                           max_attempts: int = 5, #attenpt to improve 3 times
+                           limit: int = None # how many top courses to order, the rest is sorted lazily
+                           ) -> RankedList:
+        """
+        Ranks with every strategy in one pass and picks the first one that passes offline metrics,
+        in the order basic -> focus on the failed metric.
+        Features are computed once, base scores of all strategies are one (n, 3) @ (3, n_strategies) product.
+        """
 
         courses = self.prepare_courses(search_res)
+        features = self._features(courses, skill_gap, known_skills, target_role)
+
+        names = list(self.STRATEGIES)
+        weights = np.array([
+            [self.STRATEGIES[name]["weights"][key] for name in names]
+            for key in self.FEATURES
+        ], dtype=np.float64)
+        scores = features["matrix"] @ weights
+
+        # metrics look at the top 10
+        select = None if limit is None else max(limit, 10)
+
+        results = {}
+        for col, name in enumerate(names):
+            order, rounded, rest = self._strategy_order(features, self.STRATEGIES[name], scores[:, col],
+                                                        limit=select)
+            metrics = self._evaluate_order(features, order)
+            checks = (self.check_skill_gain(metrics), self.check_diversity(metrics),
+                      self.check_position_bias(metrics))
+            results[name] = (order, rounded, rest, metrics, checks)
+            logger.info(f"Strategy '{name}': {metrics}, skill gain / diversity / position bias OK: {checks}")
 
         tried_strategies = set()
         strategy = "basic"  # start with basic one
@@ -328,32 +478,11 @@ class CourseRanker:
                 strategy = "basic"
 
             tried_strategies.add(strategy)
-
-            params = self.STRATEGIES[strategy]
-            logger.info(f"Ranking attempt {attempt + 1} with strategy '{strategy}'")
-
-            ranked = self.rank_courses(
-                courses,
-                skill_gap,
-                known_skills,
-                target_role,
-                weights=params["weights"],
-                strategy_name=strategy
-            )
-
-            metrics = self.evaluate_ranking(ranked, target_role)
-            self.last_metrics = metrics
-            logger.info(f"Evaluation metrics: {metrics}")
-
-            skill_gain_ok = self.check_skill_gain(metrics)
-            diversity_ok = self.check_diversity(metrics)
-            position_bias_ok = self.check_position_bias(metrics)
-
-            logger.info(
-                f"Skill gain OK: {skill_gain_ok}, Diversity OK: {diversity_ok}, Position bias OK: {position_bias_ok}")
+            chosen_strategy = strategy
+            skill_gain_ok, diversity_ok, position_bias_ok = results[strategy][4]
 
             if skill_gain_ok and diversity_ok and position_bias_ok:
-                return ranked
+                break
 
             # choose next strategy
             if not skill_gain_ok and "skill_gain_focus" not in tried_strategies:
@@ -366,85 +495,125 @@ class CourseRanker:
                 # all tried, return last (hopefully best)
                 break
 
-        return ranked
+        order, rounded, rest, metrics, _ = results[chosen_strategy]
+        self.last_metrics = metrics
+        logger.info(f"Chosen strategy '{chosen_strategy}'")
+        return self._ranked(courses, features, order, rounded, rest)
+
+    def _feedback_positions(self, ranked: RankedList, feedback_dict: Dict[str, str]) -> List[tuple]:
+        """
+        (position, feedback type) in the ranking as it was shown to the user.
+        keys are course (resource) ids, or node indexes in the roadmap
+        """
+        position_by_id = {str(course_id): pos for pos, course_id in enumerate(ranked.ids)}
+        positions = []
+        for key, feedback_type in feedback_dict.items():
+            pos = position_by_id.get(str(key))
+            if pos is None and str(key).isdigit():
+                pos = int(key)
+            if pos is None or pos >= len(ranked):
+                logger.warning(f"Feedback '{feedback_type}' on unknown course or node {key}")
+                continue
+            positions.append((pos, feedback_type))
+        return positions
+
+    def _rescore(self, ranked: RankedList, skill_gap: List[str], known_skills: List[str],
+                 target_role: str) -> RankedList:
+        """
+        basic ranking again for a smaller gap: columns of skills that left the gap are dropped
+        from the stored coverage bitmasks, courses are not matched against skills again
+        """
+        gap = list(dict.fromkeys(skill_gap))
+        column = {skill: col for col, skill in enumerate(ranked.gap)}
+        courses = ranked.courses()
+        if any(skill not in column for skill in gap):
+            # gap got new skills, nothing to reuse
+            return self.rank_courses(courses, skill_gap, known_skills, target_role)
+
+        covered = ranked.covered()[:, [column[skill] for skill in gap]]
+        features = self._features(courses, skill_gap, known_skills, target_role, coverage=(covered, gap))
+        strategy = self.STRATEGIES["basic"]
+        score = features["matrix"] @ np.array([strategy["weights"][key] for key in self.FEATURES], dtype=np.float64)
+        order, rounded, rest = self._strategy_order(features, strategy, score)
+        return self._ranked(courses, features, order, rounded, rest)
 
     def update_ranking(self,
-                       ranked_courses: List[Dict],
-                       feedback_dict: Dict[int, str],  # - "too_easy"
+                       ranked_courses: RankedList,
+                       feedback_dict: Dict[str, str],  # course id or node index -> reason:
+                                            # - "too_easy"
                                             # - "wrong_skills"
                                             # - "too_hard"
                                             # - "bad_author"
                                             # - "unavailable"
                        known_skills: List[str],
                        user_role: str
-                       ) -> List[Dict]:
+                       ) -> Tuple[RankedList, Dict[str, list]]:
         """
-        Re-ranking based on user feedback (human metric)
+        Re-ranking based on user feedback (human metric).
+        All feedback is compiled into excluded courses, authors and skills plus demotions
+        and applied to the ranking in one pass.
+        Returns the new ranking and what the user threw out (courses, authors, skills).
         """
-        updated_courses = ranked_courses.copy()
+        catalog = self.catalog
+        ranked = ranked_courses
+        ranked.settle()
         new_known_skills = set(known_skills) #to update
 
-        for node_id, feedback_type in feedback_dict.items():
-            if node_id >= len(updated_courses):
-                continue
-
-            course = updated_courses[node_id]
-            details = course["course"]["details"]
-            original = details.get("original_point", {})
+        excluded_rows = []
+        excluded_authors = set()
+        excluded_skills = set()  # catalog skill ids
+        demoted = []
 
-            course_id = details.get("id")
-            course_skills = set(original.get("skills", []))
-            author = original.get("author")
-
-            logger.info(f"Feedback '{feedback_type}' on course {course_id} at node {node_id}")
+        for pos, feedback_type in self._feedback_positions(ranked, feedback_dict):
+            row = int(ranked.rows[pos])
+            logger.info(f"Feedback '{feedback_type}' on course {catalog.ids[row]} at node {pos}")
 
             if feedback_type == "too_easy":
-                # update known skills
-                new_known_skills.update(course_skills)
-                # throw out course
-                updated_courses = [
-                    c for c in updated_courses
-                    if c["course"]["details"]["id"] != course_id
-                ]
+                # update known skills and throw out course
+                new_known_skills.update(catalog.courses[row].get("skills") or [])
+                excluded_rows.append(row)
             elif feedback_type == "wrong_skills":
                 # throw out this course and similar ones
-                updated_courses = [
-                    c for c in updated_courses
-                    if c["course"]["details"]["id"] != course_id and not (
-                            course_skills & set(c["course"]["details"]["original_point"].get("skills", []))
-                    )
-                ]
+                excluded_rows.append(row)
+                excluded_skills |= catalog.course_skills[row]
             elif feedback_type == "too_hard":
                 # make course further in roadmap
-                logger.info('Feedback type is "too_hard"')
-                if node_id < len(updated_courses):
-                    course = updated_courses.pop(node_id)
-                    new_pos = min(node_id + 3, len(updated_courses))
-                    updated_courses.insert(new_pos, course)
+                demoted.append(row)
             elif feedback_type == "bad_author":
-                # throw out courses with that author
-                updated_courses = [
-                    c for c in updated_courses
-                    if c["course"]["details"]["original_point"].get("author") != author
-                ]
+                # throw out courses with that author, only the course itself if author is unknown
+                excluded_rows.append(row)
+                if catalog.course_author[row] >= 0:
+                    excluded_authors.add(catalog.course_author[row])
             elif feedback_type == "unavailable":
                 # throw out course and add it to a buffer zone
-                updated_courses = [
-                    c for c in updated_courses
-                    if c["course"]["details"]["id"] != course_id
-                ]
-                self.buffer_zone.append(course)
+                excluded_rows.append(row)
+                self.buffer_zone.append(ranked.item(pos))
             else:
                 logger.warning(f"Unknown feedback type: {feedback_type}")
 
-        # recalculate skill gap and rerank
+        # what the user threw out, to keep it out of the next searches
+        exclusions = {
+            "courses": [catalog.ids[row] for row in excluded_rows],
+            "authors": list(dict.fromkeys(catalog.courses[row].get("author") for row in excluded_rows
+                                          if catalog.course_author[row] in excluded_authors)),
+            "skills": [catalog.skill_names[skill] for skill in excluded_skills]
+        }
+
+        excluded = catalog.excluded_rows(excluded_rows, excluded_authors, excluded_skills)
+        keep = ~np.isin(ranked.rows, np.fromiter(excluded, dtype=np.int64, count=len(excluded)))
+        updated_courses = ranked.filter(keep)
+
+        if demoted:
+            # demoted course goes 3 positions down: right after the course that was 3 below it
+            keys = np.arange(len(updated_courses), dtype=np.float64)
+            is_demoted = np.isin(updated_courses.rows, demoted)
+            keys[is_demoted] += 3.5
+            updated_courses = updated_courses.take(np.argsort(keys, kind="stable"))
+
+        # recalculate skill gap and rescore
         if new_known_skills != set(known_skills) and self.skill_gap_analyzer:
             missing_skills = self.skill_gap_analyzer.compute_gap(list(new_known_skills), user_role)[
                 "missing_skills"]
-            flattened_courses = [c["course"]["details"]["original_point"] for c in updated_courses]
-            for course in flattened_courses:
-                course["id"] = course.get("id") or course.get("url")  # ensure ID exists
-            updated_courses = self.rank_courses(flattened_courses, missing_skills, list(new_known_skills),
-                                                user_role)
+            updated_courses = self._rescore(updated_courses, missing_skills, list(new_known_skills), user_role)
 
-        return updated_courses
+        return updated_courses, exclusions
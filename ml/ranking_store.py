@@ -0,0 +1,136 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+class RankingStore:
+    """
+    Per-user ranking sessions for /update_roadmap/.
+    A session is compact: ranked course ids, their scores and the request context
+    (role, skills, query), serialized to json. Sessions live in a bounded LRU with TTL,
+    optionally backed by a SQLite file so they survive ML restarts.
+    """
+
+    def __init__(self, max_users: int = None, ttl: float = None, db_path: str = None):
+        if max_users is None:
+            max_users = int(os.getenv("RANKING_STORE_SIZE", 5000))
+        if ttl is None:
+            ttl = float(os.getenv("RANKING_STORE_TTL", 7 * 24 * 3600))
+        if db_path is None:
+            db_path = os.getenv("RANKING_STORE_PATH")
+
+        self.max_users = max_users
+        self.ttl = ttl
+        self.db_path = db_path
+
+        self._memory = OrderedDict()  # user_id -> (expires_at, json)
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS rankings ("
+                "user_id TEXT PRIMARY KEY, expires_at REAL NOT NULL, data TEXT NOT NULL)"
+            )
+            self._db.commit()
+            self.prune()
+            logger.info(f"Opened ranking store {db_path}")
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._memory),
+            "max_users": self.max_users,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _remember(self, user_id: str, expires_at: float, data: str):
+        self._memory[user_id] = (expires_at, data)
+        self._memory.move_to_end(user_id)
+        while len(self._memory) > self.max_users:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def put(self, user_id, ids: list, scores: list, context: dict = None):
+        user_id = str(user_id)
+        data = json.dumps({"ids": ids, "scores": scores, "context": context or {}}, separators=(",", ":"))
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(user_id, expires_at, data)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO rankings (user_id, expires_at, data) VALUES (?, ?, ?)",
+                    (user_id, expires_at, data)
+                )
+                self._db.commit()
+
+    def get(self, user_id) -> Optional[dict]:
+        """{'ids', 'scores', 'context'} or None if the session is unknown or expired"""
+        user_id = str(user_id)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._memory.move_to_end(user_id)
+                self.hits += 1
+                return json.loads(entry[1])
+            if entry is not None:
+                del self._memory[user_id]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT expires_at, data FROM rankings WHERE user_id = ?", (user_id,)
+                ).fetchone()
+                if row is not None and row[0] > now:
+                    self._remember(user_id, row[0], row[1])
+                    self.disk_hits += 1
+                    return json.loads(row[1])
+
+            self.misses += 1
+            return None
+
+    def delete(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            self._memory.pop(user_id, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM rankings WHERE user_id = ?", (user_id,))
+                self._db.commit()
+
+    def prune(self):
+        """drop expired sessions from the disk tier"""
+        if self._db is None:
+            return
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM rankings WHERE expires_at <= ?", (time.time(),)).rowcount
+            self._db.commit()
+        if deleted:
+            logger.info(f"Pruned {deleted} expired ranking sessions")
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
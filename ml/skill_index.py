@@ -0,0 +1,112 @@
+import ast
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+NON_WORD = re.compile(r"[^a-z0-9\s]")
+
+
+class SkillIndex:
+    """
+    Skill normalization table shared by the ranker and the gap analyzer.
+    Raw skill strings are canonicalized once (lowercase, single spaces,
+    synonyms from reverse_skill_map.json) and split into words, every word
+    gets an integer id. Results are memoized in LRU tables of at most
+    cache_size entries, so after warm-up with the catalog and role skills
+    the request path does only dict lookups while free-text skills from
+    requests cannot grow them without limit.
+    """
+
+    def __init__(self, synonyms: Dict[str, str] = None, cache_size: int = None):
+        self.synonyms = {" ".join(k.lower().split()): v for k, v in (synonyms or {}).items()}
+        self.word_ids: Dict[str, int] = {}
+        self.role_skills = set()
+        self.cache_size = cache_size or int(os.getenv("SKILL_CACHE_SIZE", 100000))
+
+        self._canonical: OrderedDict = OrderedDict()
+        self._skill_word_ids: OrderedDict = OrderedDict()
+        self._course_ids: OrderedDict = OrderedDict()
+
+    def __len__(self):
+        return len(self.word_ids)
+
+    def word_id(self, word: str) -> int:
+        return self.word_ids.setdefault(word, len(self.word_ids))
+
+    def _cached(self, cache: OrderedDict, key):
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+    def _remember(self, cache: OrderedDict, key, value):
+        cache[key] = value
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def canonical(self, skill: str) -> str:
+        """lowercase, collapse spaces and replace synonyms; role skills are already canonical"""
+        result = self._cached(self._canonical, skill)
+        if result is None:
+            key = " ".join(str(skill).lower().split())
+            if key not in self.role_skills:
+                key = self.synonyms.get(key, key)
+            self._remember(self._canonical, skill, key)
+            result = key
+        return result
+
+    def skill_word_ids(self, skill: str) -> tuple:
+        ids = self._cached(self._skill_word_ids, skill)
+        if ids is None:
+            words = NON_WORD.sub("", self.canonical(skill)).split()
+            ids = tuple(self.word_id(word) for word in words)
+            self._remember(self._skill_word_ids, skill, ids)
+        return ids
+
+    def course_ids(self, raw_course_skills) -> np.ndarray:
+        """sorted unique word ids of a course skills list (list or its string repr)"""
+        if isinstance(raw_course_skills, str):
+            try:
+                raw_course_skills = ast.literal_eval(raw_course_skills)
+            except Exception:
+                raw_course_skills = []
+        key = tuple(raw_course_skills or ())
+
+        ids = self._cached(self._course_ids, key)
+        if ids is None:
+            ids = np.unique(np.fromiter(
+                (word_id for skill in key for word_id in self.skill_word_ids(skill)),
+                dtype=np.int64
+            ))
+            self._remember(self._course_ids, key, ids)
+        return ids
+
+    def lookup(self, skill: str) -> int:
+        """id of a word, -1 if no course has it"""
+        return self.word_ids.get(skill, -1)
+
+    def add_roles(self, role_to_skills: Dict[str, List[str]]):
+        for skills in role_to_skills.values():
+            self.role_skills.update(" ".join(skill.lower().split()) for skill in skills)
+        self._canonical.clear()
+        self._skill_word_ids.clear()
+        self._course_ids.clear()
+
+    def add_courses(self, course_skills: Iterable):
+        count = 0
+        for skills in course_skills:
+            self.course_ids(skills)
+            count += 1
+        logger.info(f"Skill index: {count} courses, {len(self._skill_word_ids)} raw skills, "
+                    f"{len(self.word_ids)} words")
@@ -1,13 +1,18 @@
 import json
 
+from skill_index import SkillIndex
+
 
 class SkillGapAnalyzer:
-    def __init__(self, role_to_skills: dict[str: list[str]]):
+    def __init__(self, role_to_skills: dict[str: list[str]],
+                 skill_index: SkillIndex = None):
         '''
         Initialize the SkillGapAnalyzer with a mapping of roles
-        to required skills.
+        to required skills. With a skill index user skills are
+        canonicalized (case, spaces, synonyms) before comparison.
         '''
         self.__role_map__ = role_to_skills
+        self.skill_index = skill_index
 
     def required_skils(self, role: str) -> list[str]:
         '''
@@ -23,6 +28,8 @@ class SkillGapAnalyzer:
         for a given role.
         '''
         required = self.required_skils(role)
+        if self.skill_index is not None:
+            user_skills = [self.skill_index.canonical(s) for s in user_skills]
         return {
             "missing_skills": list(set(required) - set(user_skills)),
             "matched_skills": list(set(user_skills) & set(required)),
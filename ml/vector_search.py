@@ -3,7 +3,14 @@ from qdrant_client import QdrantClient
 from qdrant_client.models import NamedVector, SearchRequest
 from qdrant_client.http.models import QueryRequest, NamedVector, PointStruct
 from qdrant_client.models import SearchRequest, NamedVector, Batch, Query
+from qdrant_client.models import Prefetch, FusionQuery, Fusion, FormulaQuery, SumExpression, MultExpression
+from qdrant_client.models import Filter, HasIdCondition
 from collections import defaultdict
+import asyncio
+import heapq
+import numpy as np
+import threading
+import time
 import torch
 import os
 import json
@@ -14,6 +21,9 @@ import requests
 import logging
 
 from models import ResourceSend
+from embedder import EmbeddingExecutor
+from embedding_cache import EmbeddingCache
+from local_search import LocalVectorIndex
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,6 +32,85 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+class QdrantUnavailableError(RuntimeError):
+    pass
+
+
+class QdrantHealth:
+    """
+    Cached Qdrant connection status with circuit-breaker semantics.
+    A background task probes the collection periodically, the search path
+    only reads the cached state and reports its own successes and failures.
+    After failure_threshold consecutive failures the circuit opens and
+    requests fail fast for reset_timeout seconds; after that the next failure reopens it at once.
+    """
+
+    def __init__(self, client, collection_name, interval: float = None,
+                 failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.client = client
+        self.collection_name = collection_name
+        self.interval = interval or float(os.getenv("QD_HEALTH_INTERVAL", 15))
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.healthy = True
+        self.last_error = None
+        self.last_check = None
+        self.failures = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return time.monotonic() < self.open_until
+
+    def before_request(self):
+        with self._lock:
+            if self.is_open:
+                raise QdrantUnavailableError(f"Qdrant circuit is open: {self.last_error}")
+
+    def record_success(self):
+        with self._lock:
+            self.healthy = True
+            self.failures = 0
+            self.open_until = 0.0
+
+    def record_failure(self, error: Exception):
+        with self._lock:
+            self.healthy = False
+            self.last_error = str(error)
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.open_until = time.monotonic() + self.reset_timeout
+                logger.error(f"Qdrant circuit opened for {self.reset_timeout}s after "
+                             f"{self.failures} failures: {error}")
+
+    def check(self) -> bool:
+        try:
+            self.client.get_collection(self.collection_name)
+        except Exception as e:
+            logger.error(f"Collection access error: {str(e)}")
+            self.record_failure(e)
+        else:
+            self.record_success()
+        self.last_check = time.time()
+        return self.healthy
+
+    async def run(self):
+        while True:
+            await asyncio.to_thread(self.check)
+            await asyncio.sleep(self.interval)
+
+    def status(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "circuit_open": self.is_open,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_check": self.last_check,
+        }
+
+
 class CourseDataProcessor:
     def __init__(self, json_path, csv_path, mapping_path=None):
         self.json_path = json_path
@@ -85,10 +174,43 @@ class CourseDataProcessor:
 
 
 class CourseVectorSearch:
+    VECTOR_NAMES = ['title', 'description', 'skills']
+    SEARCH_LIMITS = {'title': 50, 'description': 20, 'skills': 100}
+    # payload keys the ranker reads and their defaults,
+    # long texts like description stay on the server until fetch_details
+    PAYLOAD_DEFAULTS = {"title": None, "skills": [], "rating": 0, "price": 0, "author": None}
+    PAYLOAD_FIELDS = list(PAYLOAD_DEFAULTS)
+
     def __init__(self):
         self._init_qdrant()
         self._init_embedder()
         
+        self.role_index = {}
+        self.role_vectors = None
+        self.role_skill_vectors = None
+        # without user skills the role's skill list fills the skills slot instead of an empty string
+        self.role_skills_fallback = os.getenv("ROLE_SKILLS_FALLBACK", "false").lower() == "true"
+        self.search_mode = os.getenv("QD_SEARCH_MODE", "formula")
+        self.local_index = None
+        self.local_index_dir = os.getenv("LOCAL_INDEX_DIR", "./local_index")
+        if self.search_mode == "local":
+            self._init_local_index()
+
+    def _init_local_index(self) -> None:
+        self.local_index = LocalVectorIndex.load_or_build(
+            self.local_index_dir,
+            self.client,
+            self.collection_name,
+            self.VECTOR_NAMES,
+            self.PAYLOAD_FIELDS,
+            quantize=os.getenv("LOCAL_INDEX_INT8", "false").lower() == "true"
+        )
+
+    def save_local_index(self) -> None:
+        """write courses added since startup, so the next start does not load a stale index"""
+        if self.local_index is not None and self.local_index.dirty:
+            self.local_index.save(self.local_index_dir)
+
     def _init_qdrant(self, collection_name: str='courses', debug: bool = False) -> None:       
         logger.info("Initializing QDrant connection")
         self.client = QdrantClient(
@@ -98,6 +220,7 @@ class CourseVectorSearch:
         logger.info(f"QDrant URL: {os.getenv('QD_URL')}")
         logger.info("Connected successfully")
         self.collection_name = collection_name
+        self.health = QdrantHealth(self.client, collection_name)
 
     def _init_embedder(self, model='sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2', max_seq=512, use_gpu=True) -> None:
         self.device = 'cuda' if torch.cuda.is_available() and use_gpu else 'cpu'
@@ -106,22 +229,94 @@ class CourseVectorSearch:
         self.skills_model = SentenceTransformer(model)
         logger.info("Loaded %s model", model)
         self.skills_model.max_seq_length = max_seq
-        
-    def get_courses(self, user_role, user_query, user_skills):
+        self.embedding_cache = EmbeddingCache()
+        self.embedder = EmbeddingExecutor(self.skills_model, cache=self.embedding_cache)
+
+    def encode_texts(self, texts, as_numpy=True):
+        """
+        encode all uncached texts in one forward pass.
+        as_numpy=True returns a contiguous float32 matrix (rows are views, no copies),
+        otherwise a list of lists for APIs that expect plain floats
+        """
+        vectors = self.embedding_cache.encode(texts, self._encode_batch)
+        return vectors if as_numpy else vectors.tolist()
+
+    def _encode_batch(self, texts, batch_size=None):
+        vectors = self.skills_model.encode(texts, batch_size=batch_size or len(texts), convert_to_numpy=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def precompute_roles(self, role_to_skills):
+        """
+        encode every role name and its skill list in one batch at startup.
+        vectors are kept as contiguous matrices, role_index maps normalized role -> row
+        """
+        roles = list(role_to_skills)
+        logger.info(f"Precomputing embeddings for {len(roles)} roles")
+        # role vectors are encoded from the same normalized key they are looked up by
+        keys = [EmbeddingCache.normalize(role) for role in roles]
+        texts = keys + [", ".join(role_to_skills[role]) for role in roles]
+        vectors = np.ascontiguousarray(self._encode_batch(texts, batch_size=64))
+
+        self.role_index = {key: row for row, key in enumerate(keys)}
+        self.role_vectors = vectors[:len(roles)]
+        self.role_skill_vectors = vectors[len(roles):]
+        logger.info(f"Role embeddings ready: {self.role_vectors.shape}")
+
+    @staticmethod
+    def _query_texts(user_role, user_query, user_skills):
+        return [user_role, user_query, ", ".join(user_skills)]
+
+    def _precomputed_query_vectors(self, user_role, user_skills):
+        """query slots that are served from role matrices without inference"""
+        known = {}
+        row = self.role_index.get(EmbeddingCache.normalize(user_role))
+        if row is not None:
+            known[0] = self.role_vectors[row]
+            if not user_skills and self.role_skills_fallback:
+                known[2] = self.role_skill_vectors[row]
+        return known
+
+    @staticmethod
+    def _merge_query_vectors(known, missing, encoded):
+        vectors = dict(known)
+        vectors.update(zip(missing, encoded))
+        return np.stack([vectors[slot] for slot in range(3)])
+
+    def encode_query(self, user_role, user_query, user_skills, as_numpy=True):
+        """role, query and skills vectors from a single batched encode"""
+        texts = self._query_texts(user_role, user_query, user_skills)
+        known = self._precomputed_query_vectors(user_role, user_skills)
+        missing = [slot for slot in range(3) if slot not in known]
+        encoded = self.encode_texts([texts[slot] for slot in missing]) if missing else []
+        vectors = self._merge_query_vectors(known, missing, encoded)
+        return vectors if as_numpy else vectors.tolist()
+
+    def get_courses(self, user_role, user_query, user_skills, exclude_ids=None):
         logger.info("Vectorizing user data")
+        role_vec, query_vec, skills_vec = self.encode_query(user_role, user_query, user_skills)
         logger.info("Searching for best courses")
-        results = self.search_courses_batch_weighted(
-            self.skills_model.encode(user_role),
-            self.skills_model.encode(user_query),
-            self.skills_model.encode(", ".join(user_skills))
-        )
+        results = self.search_courses_batch_weighted(role_vec, query_vec, skills_vec, exclude_ids=exclude_ids)
         return results
 
+    async def get_courses_async(self, user_role, user_query, user_skills, exclude_ids=None):
+        """same as get_courses, but encoding and search do not block the event loop"""
+        logger.info("Vectorizing user data")
+        texts = self._query_texts(user_role, user_query, user_skills)
+        known = self._precomputed_query_vectors(user_role, user_skills)
+        missing = [slot for slot in range(3) if slot not in known]
+        encoded = await self.embedder.encode([texts[slot] for slot in missing]) if missing else []
+        role_vec, query_vec, skills_vec = self._merge_query_vectors(known, missing, encoded)
+        logger.info("Searching for best courses")
+        return await asyncio.to_thread(
+            self.search_courses_batch_weighted, role_vec, query_vec, skills_vec, exclude_ids=exclude_ids
+        )
+
     def insert_resource(self, resource: ResourceSend):
         logger.info(f"Inserting resource: {resource.title}")
-        title_vec = self.skills_model.encode(resource.title or "")
-        desc_vec = self.skills_model.encode(resource.description or "")
-        skills_vec = self.skills_model.encode(", ".join(resource.skills))
+        title_vec, desc_vec, skills_vec = self.encode_texts(
+            [resource.title or "", resource.description or "", ", ".join(resource.skills)],
+            as_numpy=False
+        )
         self.client.upsert(
             collection_name=self.collection_name,
             points=[
@@ -140,51 +335,181 @@ class CourseVectorSearch:
             )
             ]
         )
+        if self.local_index is not None:
+            row = self.local_index.row_by_id.get(str(resource.resource_id))
+            known = self.local_index.payloads[row] if row is not None else {}
+            self.local_index.add(
+                str(resource.resource_id),
+                {"title": title_vec, "description": desc_vec, "skills": skills_vec},
+                self.project_payload({**known, "title": resource.title, "skills": resource.skills})
+            )
 
     def search_courses_batch_weighted(self, title_vector, description_vector, skills_vector,
-                                      weights={'title': 0.2, 'description': 0.1, 'skills': 0.7}, limit=30):
-
+                                      weights={'title': 0.2, 'description': 0.1, 'skills': 0.7}, limit=30,
+                                      mode=None, exclude_ids=None):
+        """
+        weighted search over the three named vectors.
+        mode "formula" - Qdrant sums weighted prefetch scores server-side,
+        "rrf" - Qdrant reciprocal rank fusion (weights ignored),
+        "client" - three searches merged in Python,
+        "local" - exact weighted cosine over the in-process course matrix, no network hop
+        exclude_ids - courses the user already threw out, they are never returned
+        """
+        mode = mode or self.search_mode
+        if mode == "local":
+            if self.local_index is None:
+                self._init_local_index()
+            vectors = {
+                'title': title_vector,
+                'description': description_vector,
+                'skills': skills_vector
+            }
+            scored = self.local_index.search(vectors, weights, limit, exclude_ids)
+            return [self._to_result(item) for item in scored]
+
+        self.health.before_request()
+
+        logger.info(f"Searching courses batch weighted, mode '{mode}'")
+        vectors = {
+            'title': np.asarray(title_vector, dtype=np.float32).tolist(),
+            'description': np.asarray(description_vector, dtype=np.float32).tolist(),
+            'skills': np.asarray(skills_vector, dtype=np.float32).tolist()
+        }
+        query_filter = Filter(must_not=[HasIdCondition(has_id=list(exclude_ids))]) if exclude_ids else None
         try:
-            # to tast connection
-            self.client.get_collection(self.collection_name)
+            if mode == "client":
+                scored = self._search_client_merge(vectors, weights, limit, query_filter)
+            else:
+                scored = self._search_fused(vectors, weights, limit, mode, query_filter)
         except Exception as e:
-            logger.error(f"Collection access error: {str(e)}")
+            logger.error(f"Search error: {str(e)}")
+            self.health.record_failure(e)
             raise
+        self.health.record_success()
+
+        logger.info(f"Chosen {len(scored)} best courses")
+
+        return [self._to_result(item) for item in scored]
+
+    def _to_result(self, item):
+        return {
+            "point": item['point'],
+            "weighted_score": item['weighted_score'],
+            "details": {
+                "id": item['point'].id,
+                "title": item['point'].payload.get('title'),
+                "original_scores": item["original_scores"],
+                "original_point": self.project_payload(item['point'].payload)
+            }
+        }
+
+    @classmethod
+    def project_payload(cls, payload):
+        """keep only the ranker fields, filling defaults for missing ones"""
+        payload = payload or {}
+        return {field: payload.get(field, default) for field, default in cls.PAYLOAD_DEFAULTS.items()}
+
+    def catalog_courses(self, batch_size=512):
+        """every course of the catalog in the ranker format (id + projected payload), for startup indexes"""
+        if self.local_index is not None:
+            for point_id, payload in self.local_index.items():
+                yield {"id": point_id, **self.project_payload(payload)}
+            return
 
-        logger.info("Searching courses batch weighted")
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=self.PAYLOAD_FIELDS,
+                with_vectors=False
+            )
+            for point in points:
+                yield {"id": point.id, **self.project_payload(point.payload)}
+            if offset is None:
+                break
+
+    def fetch_details(self, ids, fields=None):
+        """
+        payloads of the given courses in one batched retrieve, fields=None returns the whole payload.
+        used by fetch_courses when /update_roadmap/ restores a stored ranking. returns {id: payload}
+        """
+        if not ids:
+            return {}
+        points = self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=list(ids),
+            with_payload=fields if fields is not None else True,
+            with_vectors=False
+        )
+        return {point.id: point.payload for point in points}
+
+    def fetch_courses(self, ids):
+        """
+        stored course ids back to search-result items (same 'details' shape as the search),
+        in the given order; courses that are gone from the catalog are skipped
+        """
+        if self.local_index is not None:
+            rows = self.local_index.row_by_id
+            payloads = {point_id: self.local_index.payloads[rows[point_id]] for point_id in ids if point_id in rows}
+        else:
+            payloads = self.fetch_details(ids, fields=self.PAYLOAD_FIELDS)
+        return [
+            {
+                "details": {
+                    "id": point_id,
+                    "title": payloads[point_id].get('title'),
+                    "original_point": self.project_payload(payloads[point_id])
+                }
+            }
+            for point_id in ids if point_id in payloads
+        ]
+
+    def _search_fused(self, vectors, weights, limit, mode, query_filter=None):
+        """one query_points call, Qdrant fuses the prefetches and returns only top-limit points"""
+        prefetch = [
+            Prefetch(query=vectors[name], using=name, limit=self.SEARCH_LIMITS[name], filter=query_filter)
+            for name in self.VECTOR_NAMES
+        ]
+        if mode == "rrf":
+            query = FusionQuery(fusion=Fusion.RRF)
+        else:
+            query = FormulaQuery(
+                formula=SumExpression(sum=[
+                    MultExpression(mult=[weights[name], f"$score[{i}]"])
+                    for i, name in enumerate(self.VECTOR_NAMES)
+                ]),
+                # point missing from a prefetch contributes nothing, as in the client-side merge
+                defaults={f"$score[{i}]": 0.0 for i in range(len(self.VECTOR_NAMES))}
+            )
+
+        response = self.client.query_points(
+            collection_name=self.collection_name,
+            prefetch=prefetch,
+            query=query,
+            limit=limit,
+            query_filter=query_filter,
+            with_payload=self.PAYLOAD_FIELDS
+        )
+        # per-vector scores stay on the server: same keys as the other modes, None as unknown
+        return [
+            {'point': point, 'weighted_score': point.score,
+             'original_scores': dict.fromkeys(self.VECTOR_NAMES)}
+            for point in response.points
+        ]
+
+    def _search_client_merge(self, vectors, weights, limit, query_filter=None):
         search_requests = [
-            SearchRequest(vector=NamedVector(name="title", vector=title_vector), limit=50, with_payload=True),
-            SearchRequest(vector=NamedVector(name="description", vector=description_vector), limit=20, with_payload=True),
-            SearchRequest(vector=NamedVector(name="skills", vector=skills_vector), limit=100, with_payload=True)
+            SearchRequest(vector=NamedVector(name=name, vector=vectors[name]), filter=query_filter,
+                          limit=self.SEARCH_LIMITS[name], with_payload=self.PAYLOAD_FIELDS)
+            for name in self.VECTOR_NAMES
         ]
         batch_results = self.client.search_batch(
             collection_name=self.collection_name,
             requests=search_requests
         )
 
-        # search_requests = [
-        #     SearchRequest(
-        #         vector=NamedVector(name="title", vector=title_vector),
-        #         limit=50,
-        #         with_payload=True
-        #     ),
-        #     SearchRequest(
-        #         vector=NamedVector(name="description", vector=description_vector),
-        #         limit=20,
-        #         with_payload=True
-        #     ),
-        #     SearchRequest(
-        #         vector=NamedVector(name="skills", vector=skills_vector),
-        #         limit=100,
-        #         with_payload=True
-        #     )
-        # ]
-        #
-        # batch_results = self.client.query_batch_points(
-        #     collection_name=self.collection_name,
-        #     requests=search_requests
-        # )
-
         weighted_scores = defaultdict(lambda: {
             'weighted_score': 0,
             'point': None,
@@ -192,9 +517,7 @@ class CourseVectorSearch:
         })
         logger.info("Summing up and weighting searching results")
 
-        vector_names = ['title', 'description', 'skills']
-        for i, results in enumerate(batch_results):
-            vector_name = vector_names[i]
+        for vector_name, results in zip(self.VECTOR_NAMES, batch_results):
             weight = weights[vector_name]
             for point in results:
                 if point.id not in weighted_scores:
@@ -202,41 +525,5 @@ class CourseVectorSearch:
                 weighted_scores[point.id]['weighted_score'] += point.score * weight
                 weighted_scores[point.id]['original_scores'][vector_name] = point.score
 
-        sorted_results = sorted(weighted_scores.values(), key=lambda x: x['weighted_score'], reverse=True)
-
-        logger.info(f"Chosen {len(sorted_results[:limit])} best courses")
-
-        # example_course = {
-        #     "point": sorted_results[0]['point'],
-        #     "weighted_score": sorted_results[0]['weighted_score'],
-        #     "details": {
-        #         "id": sorted_results[0]['point'].id,
-        #         "title": sorted_results[0]['point'].payload.get('title'),
-        #         "original_scores": sorted_results[0]["original_scores"],
-        #         "original_point": sorted_results[0]["point"].payload
-        #     }
-        # }
-        # logger.info(f"Example returned course: {example_course}")
-
-        return [
-            {
-                "point": item['point'],
-                "weighted_score": item['weighted_score'],
-                "details": {
-                    "id": item['point'].id,
-                    "title": item['point'].payload.get('title'),
-                    "original_scores": item["original_scores"],
-                    "original_point": {
-                        "title": item['point'].payload.get("title"),
-                        "skills": item['point'].payload.get("skills", []),
-                        "rating": item['point'].payload.get("rating", 0),
-                        "price": item['point'].payload.get("price", 0),
-                        "author": item['point'].payload.get("author")
-                    }
-                }
-            }
-            for item in sorted_results[:limit]
-        ]
-
-
-
+        # only top-limit of up to 170 merged candidates are used, no need to sort all of them
+        return heapq.nlargest(limit, weighted_scores.values(), key=lambda x: x['weighted_score'])